@@ -0,0 +1,189 @@
+"""
+Dispatch-cost benchmark for the three designs of the payroll domain.
+
+- inheritance/employee.py: deep inheritance (Manager -> SalaryEmployee -> Employee)
+- inheritance/final_design.py: multiple inheritance of roles and policies
+  (Manager(Employee, ManagerRole, SalaryPolicy))
+- composition/employees.py: delegation to a role and a payroll policy
+
+Each design builds the same synthetic roster of N employees and is measured
+for construction time, work() and calculate_payroll() throughput, memory per
+employee and the cost of looking calculate_payroll up through the MRO.
+
+"work" is the closest equivalent in each design: inheritance/employee.py
+work() prints, so stdout is discarded while it runs; final_design work()
+returns the duty string; composition uses Employee.track_work, which is
+work() without the printing. Addresses are left out of the composition
+roster since the other designs have none.
+
+Usage: python benchmarks/dispatch.py [--size N] [--repeat R]
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _load(relative_path, name):
+    # The designs reuse module names (payroll_system, Employee...), so they
+    # are loaded from their paths under unique names. Importing them prints
+    # a banner, which is discarded.
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(ROOT, relative_path)
+    )
+    module = importlib.util.module_from_spec(spec)
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec.loader.exec_module(module)
+    return module
+
+
+def _composition():
+    sys.path.insert(0, os.path.join(ROOT, "composition"))
+    import employees
+    import payroll_system
+    import productivity
+
+    return employees, payroll_system, productivity
+
+
+def deep_inheritance_roster():
+    module = _load("inheritance/employee.py", "bench_inheritance_employee")
+    builders = [
+        lambda i: module.Manager(i, "Manager", 3000),
+        lambda i: module.Secretary(i, "Secretary", 1500),
+        lambda i: module.SalesPerson(i, "Sales", 1000, 250),
+        lambda i: module.FactoryWorker(i, "Factory", 40, 15),
+    ]
+    return builders, lambda employee, hours: employee.work(hours)
+
+
+def multiple_inheritance_roster():
+    module = _load("inheritance/final_design.py", "bench_final_design")
+    builders = [
+        lambda i: module.Manager(i, "Manager", 3000),
+        lambda i: module.Secretary(i, "Secretary", 1500),
+        lambda i: module.SalesPerson(i, "Sales", 1000, 250),
+        lambda i: module.FactoryWorker(i, "Factory", 40, 15),
+        lambda i: module.TemporarySecretary(i, "Temporary", 40, 9),
+    ]
+    return builders, lambda employee, hours: employee.work(hours)
+
+
+def composition_roster():
+    employees, payroll_system, productivity = _composition()
+    roles = productivity.ProductivitySystem()
+    Employee = employees.Employee
+    policies = [
+        ("manager", lambda: payroll_system.SalaryPolicy(3000)),
+        ("secretary", lambda: payroll_system.SalaryPolicy(1500)),
+        ("sales", lambda: payroll_system.CommissionPolicy(1000, 250)),
+        ("factory", lambda: payroll_system.HourlyPolicy(15)),
+    ]
+    builders = [
+        lambda i, role=role, policy=policy: Employee(
+            i, role, None, roles.get_role(role), policy()
+        )
+        for role, policy in policies
+    ]
+    return builders, lambda employee, hours: employee.track_work(hours)
+
+
+DESIGNS = [
+    ("deep inheritance", deep_inheritance_roster),
+    ("multiple inheritance", multiple_inheritance_roster),
+    ("composition", composition_roster),
+]
+
+
+def _build(builders, size):
+    count = len(builders)
+    return [builders[i % count](i) for i in range(size)]
+
+
+def _best(repeat, run):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _work(roster, work):
+    with contextlib.redirect_stdout(io.StringIO()):
+        for employee in roster:
+            work(employee, 40)
+
+
+def _payroll(roster):
+    for employee in roster:
+        employee.calculate_payroll()
+
+
+def _lookup(roster):
+    for employee in roster:
+        employee.calculate_payroll
+
+
+def measure(name, make_roster, size, repeat):
+    builders, work = make_roster()
+
+    construction = _best(repeat, lambda: _build(builders, size))
+
+    tracemalloc.start()
+    roster = _build(builders, size)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    work_time = _best(repeat, lambda: _work(roster, work))
+    payroll_time = _best(repeat, lambda: _payroll(roster))
+    lookup_time = _best(repeat, lambda: _lookup(roster))
+    mro = sum(len(type(employee).__mro__) for employee in roster) / size
+
+    return {
+        "design": name,
+        "construct_us": construction / size * 1e6,
+        "work_per_s": size / work_time,
+        "payroll_per_s": size / payroll_time,
+        "bytes": used / size,
+        "mro": mro,
+        "lookup_ns": lookup_time / size * 1e9,
+    }
+
+
+def print_table(results):
+    header = (
+        f"{'design':<22}{'construct us':>13}{'work/s':>13}"
+        f"{'payroll/s':>13}{'bytes/emp':>11}{'MRO len':>9}{'lookup ns':>11}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['design']:<22}{r['construct_us']:>13.2f}{r['work_per_s']:>13,.0f}"
+            f"{r['payroll_per_s']:>13,.0f}{r['bytes']:>11.0f}{r['mro']:>9.1f}"
+            f"{r['lookup_ns']:>11.1f}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{args.size} employees, best of {args.repeat}")
+    print_table(
+        [measure(name, roster, args.size, args.repeat) for name, roster in DESIGNS]
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,32 +2,154 @@
 Employee might have an address as well.
 """
 
+import sys
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+# Sorts after any character used in a zipcode, for prefix queries.
+_MAX_CHAR = "\U0010ffff"
+
 
 class Address:
+    # The rendered label lives in a slot, not in __dict__, so serializers that
+    # read __dict__ (DictMixin.to_dict, export, from_dict) never see it.
+    __slots__ = ("__dict__", "__weakref__", "_label")
+    _FIELDS = frozenset(["street", "street2", "city", "state", "zipcode"])
+
     def __init__(self, street, city, state, zipcode, street2=""):
-        self.street = street
-        self.street2 = street2
-        self.city = city
-        self.state = state
-        self.zipcode = zipcode
+        # Bypasses __setattr__, there is no rendered label to invalidate yet.
+        self.__dict__.update(
+            street=street, street2=street2, city=city, state=state, zipcode=zipcode
+        )
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self._FIELDS:
+            super().__setattr__("_label", None)
 
     def __str__(self):
-        lines = [self.street]
-        if self.street2:
-            lines.append(self.street2)
-        lines.append(f"{self.city}, {self.state} {self.zipcode}")
-        return "\n".join(lines)
+        label = getattr(self, "_label", None)
+        if label is None:
+            lines = [self.street]
+            if self.street2:
+                lines.append(self.street2)
+            lines.append(f"{self.city}, {self.state} {self.zipcode}")
+            label = "\n".join(lines)
+            super().__setattr__("_label", label)
+        return label
+
+
+def render_labels(addresses, separator="\n\n"):
+    """
+    Renders addresses into one string. join sizes the result once and copies
+    every cached label into it, there is no per-address concatenation.
+    """
+    return separator.join([str(address) for address in addresses])
+
+
+def write_labels(addresses, stream=None, separator="\n\n"):
+    """
+    Writes the labels of all addresses with a single write call.
+    """
+    labels = render_labels(addresses, separator)
+    if labels:
+        (stream or sys.stdout).write(labels + "\n")
 
 
 class AddressBook:
-    def __init__(self):
-        self._employee_addresses = {
-            1: Address("121 Admin Rd.", "Concord", "NH", "03301"),
-            2: Address("67 Paperwork Ave", "Manchester", "NH", "03101"),
-            3: Address("15 Rose St", "Concord", "NH", "03301", "Apt. B-1"),
-            4: Address("39 Sole St.", "Concord", "NH", "03301"),
-            5: Address("99 Mountain Rd.", "Concord", "NH", "03301"),
-        }
+    def __init__(self, employee_addresses=None):
+        if employee_addresses is None:
+            employee_addresses = {
+                1: Address("121 Admin Rd.", "Concord", "NH", "03301"),
+                2: Address("67 Paperwork Ave", "Manchester", "NH", "03101"),
+                3: Address("15 Rose St", "Concord", "NH", "03301", "Apt. B-1"),
+                4: Address("39 Sole St.", "Concord", "NH", "03301"),
+                5: Address("99 Mountain Rd.", "Concord", "NH", "03301"),
+            }
+        self._employee_addresses = {}
+        # Secondary indexes: value -> set of employee ids.
+        self._by_state = defaultdict(set)
+        self._by_city = defaultdict(set)
+        self._by_zipcode = defaultdict(set)
+        # employee id -> (state, city, zipcode) it is indexed under, addresses
+        # may be changed directly and no longer match their index entries.
+        self._indexed = {}
+        # Distinct zipcodes kept sorted so mailing batches need no full sort.
+        self._zipcodes = []
+        for employee_id, address in employee_addresses.items():
+            self.add_address(employee_id, address)
+
+    def add_address(self, employee_id, address):
+        if employee_id in self._employee_addresses:
+            self._unindex(employee_id)
+        self._employee_addresses[employee_id] = address
+        self._index(employee_id)
+
+    def update_address(self, employee_id, **changes):
+        address = self.get_employee_address(employee_id)
+        self._unindex(employee_id)
+        for field, value in changes.items():
+            setattr(address, field, value)
+        self._index(employee_id)
+
+    def remove_address(self, employee_id):
+        self.get_employee_address(employee_id)
+        self._unindex(employee_id)
+        del self._employee_addresses[employee_id]
+
+    def _index(self, employee_id):
+        address = self._employee_addresses[employee_id]
+        self._indexed[employee_id] = (address.state, address.city, address.zipcode)
+        self._by_state[address.state].add(employee_id)
+        self._by_city[address.city].add(employee_id)
+        if address.zipcode not in self._by_zipcode:
+            insort(self._zipcodes, address.zipcode)
+        self._by_zipcode[address.zipcode].add(employee_id)
+
+    def _unindex(self, employee_id):
+        state, city, zipcode = self._indexed.pop(employee_id)
+        for index, key in (
+            (self._by_state, state),
+            (self._by_city, city),
+            (self._by_zipcode, zipcode),
+        ):
+            ids = index.get(key, ())
+            if employee_id not in ids:
+                continue
+            ids.discard(employee_id)
+            if not ids:
+                del index[key]
+                if index is self._by_zipcode:
+                    del self._zipcodes[bisect_left(self._zipcodes, key)]
+
+    def by_state(self, state):
+        return set(self._by_state.get(state, ()))
+
+    def by_city(self, city):
+        return set(self._by_city.get(city, ()))
+
+    def by_zipcode(self, zipcode):
+        return set(self._by_zipcode.get(zipcode, ()))
+
+    def iter_zipcodes(self, low=None, high=None):
+        """
+        Yields (zipcode, employee ids) in zipcode order for low <= zipcode < high.
+        """
+        zipcodes = self._zipcodes
+        start = 0 if low is None else bisect_left(zipcodes, low)
+        stop = len(zipcodes) if high is None else bisect_left(zipcodes, high)
+        for zipcode in zipcodes[start:stop]:
+            yield zipcode, set(self._by_zipcode[zipcode])
+
+    def by_zipcode_range(self, low, high):
+        return [
+            employee_id
+            for _, ids in self.iter_zipcodes(low, high)
+            for employee_id in sorted(ids)
+        ]
+
+    def by_zipcode_prefix(self, prefix):
+        return self.by_zipcode_range(prefix, prefix + _MAX_CHAR)
 
     def get_employee_address(self, employee_id):
         address = self._employee_addresses.get(employee_id)
@@ -0,0 +1,175 @@
+"""
+Policy specialization compiler.
+
+A CommissionPolicy check amount normally takes a bound method call, a
+super() hop into SalaryPolicy and a property call. The compiler walks the MRO
+of a policy class once, inlines every method it knows the formula of and
+generates one flat function per class, e.g. for CommissionPolicy:
+
+    def evaluate(p):
+        return (p.weekly_salary) + (p.hours_worked / 5 * p.commission_per_sale)
+
+The formulas keep the operations of the original methods in the same order,
+so results are identical. Subclasses that don't override anything get the
+same flat function. A method or property the compiler doesn't know (a user
+override or an instrumentation wrapper) is called through its function,
+f0(p), which skips the per-call attribute and bound method lookups, and the
+known formulas around it are still inlined. Only attributes that are neither
+functions nor properties (e.g. staticmethods) make the class fall back to its
+own calculate_payroll.
+
+The first policy of every class is evaluated both ways. If the results
+differ, that class goes back to its own calculate_payroll.
+"""
+
+import re
+from types import FunctionType
+
+from payroll_system import CommissionPolicy, HourlyPolicy, SalaryPolicy
+
+# Formulas of known methods, keyed by function object so that a replaced
+# method is never inlined. {super.name} and {self.name} are resolved like
+# super().name and self.name would be.
+FORMULAS = {
+    SalaryPolicy.__dict__["calculate_payroll"]: "p.weekly_salary",
+    HourlyPolicy.__dict__["calculate_payroll"]: "p.hours_worked * p.hourly_rate",
+    CommissionPolicy.__dict__["calculate_payroll"]: (
+        "({super.calculate_payroll}) + ({self.commission})"
+    ),
+    CommissionPolicy.__dict__["commission"].fget: (
+        "p.hours_worked / 5 * p.commission_per_sale"
+    ),
+}
+
+_PLACEHOLDER = re.compile(r"\{(super|self)\.(\w+)\}")
+
+
+class PolicyCompiler:
+    def __init__(self):
+        # Evaluators already checked against their class, by class.
+        self._ready = {}
+
+    def evaluate(self, policy):
+        try:
+            return self._ready[type(policy)](policy)
+        except KeyError:
+            return self._prepare(policy)
+
+    def evaluate_all(self, policies):
+        evaluate = self.evaluate
+        return [evaluate(policy) for policy in policies]
+
+    def _prepare(self, policy):
+        """
+        Compiles the class of policy, checks it on policy and returns the
+        check amount of policy.
+        """
+        cls = type(policy)
+        evaluator = compile_policy_type(cls)
+        expected = policy.calculate_payroll()
+        if evaluator is not cls.calculate_payroll and evaluator(policy) != expected:
+            evaluator = cls.calculate_payroll
+        self._ready[cls] = evaluator
+        return expected
+
+    def invalidate(self, cls=None):
+        """
+        Call after replacing methods on policy classes.
+        """
+        if cls is None:
+            self._ready.clear()
+        else:
+            self._ready.pop(cls, None)
+
+
+def compile_policy_type(cls):
+    """
+    Returns a function evaluating calculate_payroll for instances of cls.
+    """
+    functions = {}
+    expression = _expression(cls, "calculate_payroll", 0, functions)
+    if expression is None:
+        return cls.calculate_payroll
+    source = f"def evaluate(p):\n    return {expression}\n"
+    namespace = {name: function for function, name in functions.items()}
+    exec(compile(source, f"<compiled {cls.__name__}>", "exec"), namespace)
+    evaluator = namespace["evaluate"]
+    evaluator.__qualname__ = f"{cls.__name__}.compiled_calculate_payroll"
+    evaluator.source = source
+    return evaluator
+
+
+def _expression(cls, name, start, functions):
+    """
+    functions collects the unknown functions called by the expression,
+    function -> name in the namespace of the compiled code.
+    """
+    mro = cls.__mro__
+    for index in range(start, len(mro)):
+        attribute = mro[index].__dict__.get(name)
+        if attribute is None:
+            continue
+        function = attribute.fget if isinstance(attribute, property) else attribute
+        formula = FORMULAS.get(function)
+        if formula is not None:
+            return _inline(cls, formula, index, functions)
+        if not isinstance(function, FunctionType):
+            return None
+        if function not in functions:
+            functions[function] = f"f{len(functions)}"
+        return f"{functions[function]}(p)"
+    return None
+
+
+def _inline(cls, formula, owner_index, functions):
+    missing = False
+
+    def resolve(match):
+        nonlocal missing
+        scope, name = match.groups()
+        start = owner_index + 1 if scope == "super" else 0
+        expression = _expression(cls, name, start, functions)
+        if expression is None:
+            missing = True
+            return ""
+        return expression
+
+    expression = _PLACEHOLDER.sub(resolve, formula)
+    return None if missing else expression
+
+
+compiler = PolicyCompiler()
+
+
+if __name__ == "__main__":
+    import time
+
+    from load_test import synthetic_policies
+
+    class BonusCommissionPolicy(CommissionPolicy):
+        @property
+        def commission(self):
+            return super().commission + 50
+
+    for cls in (SalaryPolicy, HourlyPolicy, CommissionPolicy, BonusCommissionPolicy):
+        evaluator = compile_policy_type(cls)
+        print(f"{cls.__name__}: {getattr(evaluator, 'source', 'calls its own method')}")
+
+    bonus = BonusCommissionPolicy(1000, 100)
+    bonus.track_work(40)
+    assert compiler.evaluate(bonus) == compiler.evaluate(bonus) == 1850.0
+
+    policies = synthetic_policies(300_000)
+    for policy in policies[:3]:
+        policy.track_work(37)
+
+    start = time.perf_counter()
+    original = [policy.calculate_payroll() for policy in policies]
+    original_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled = compiler.evaluate_all(policies)
+    compiled_time = time.perf_counter() - start
+
+    print(f"identical: {original == compiled}")
+    print(f"methods {original_time:.3f}s, compiled {compiled_time:.3f}s")
@@ -0,0 +1,282 @@
+"""
+from_dict / from_json: the way back from to_dict.
+
+Building objects through their constructors runs every __init__ of the
+super() chain for data that is already complete. A construction plan is
+compiled once per class and set of keys instead, like the serializers of
+mixin.py: the instance is made with cls.__new__ and every key is assigned
+with a plain attribute store, which works for __dict__ and __slots__ classes
+alike. Classes with a custom __setattr__ (e.g. Address) are assigned through
+object.__setattr__, as their __init__ would start from an empty object too.
+Only the declared nested fields are converted, __init__ is not called.
+Keys that are not plain names (or are keywords, like "class") are assigned
+with setattr, dunder keys such as "__class__" are rejected with ValueError.
+
+Nested types are declared with a class attribute:
+
+    class Employee(DictMixin):
+        nested_types = {"address": Address, "reports": [Employee]}
+
+A type builds that field from a dict, [type] builds every item of a list.
+Undeclared fields keep their plain JSON values. invalidate_plans() drops the
+cached plans after nested_types changed.
+
+Every class remembers the plan it was last built with, and a dict is first
+tried on that plan: the plan checks the number of keys and raises KeyError
+for a missing one, so it only builds dicts with exactly its keys (in any
+order). Otherwise the plan is looked up by the keys, which costs a tuple of
+the keys per dict. For a flat class with a cheap __init__ a single from_dict
+still costs a call more than the constructor, from_dicts is the bulk path.
+
+With resolve_references=True the {"$id": n} / {"$ref": n} markers written by
+to_shared_dict are resolved, so shared objects and cycles come back as the
+same object. That path does not use the compiled plans.
+"""
+
+import gc
+import json
+import keyword
+import sys
+import time
+
+from mixin import DictMixin, Employee, _builders, _last_builders
+from references import ID, REF
+
+
+def invalidate_plans(cls=None):
+    for key in list(_builders):
+        if cls is None or key[0] is cls:
+            del _builders[key]
+    for key in list(_last_builders):
+        if cls is None or key is cls:
+            del _last_builders[key]
+
+
+def build(cls, data):
+    builder = _last_builders.get(cls)
+    if builder is not None:
+        try:
+            return builder(data)
+        except KeyError:
+            pass
+    key = (cls, tuple(data))
+    builder = _builders.get(key) or _compile_builder(key)
+    _last_builders[cls] = builder
+    return builder(data)
+
+
+def _nested_types(cls):
+    return dict(getattr(cls, "nested_types", None) or {})
+
+
+def _check_name(cls, name):
+    if name.startswith("__") and name.endswith("__"):
+        raise ValueError(f"{cls.__name__}: refusing to set {name!r}")
+
+
+def _compile_builder(key):
+    cls, names = key
+    nested = _nested_types(cls)
+    direct = cls.__setattr__ is object.__setattr__
+    namespace = {
+        "new": cls.__new__,
+        "cls": cls,
+        "setattr": object.__setattr__,
+        "build": build,
+    }
+    lines = [
+        "def builder(data):",
+        f"    if len(data) != {len(names)}:",
+        "        raise KeyError",
+        "    obj = new(cls)",
+    ]
+    for index, name in enumerate(names):
+        _check_name(cls, name)
+        value = f"data[{name!r}]"
+        spec = nested.get(name)
+        if spec is not None:
+            item_type = spec[0] if isinstance(spec, list) else spec
+            namespace[f"type_{index}"] = item_type
+            lines.append(f"    value = {value}")
+            if isinstance(spec, list):
+                converted = f"[build(type_{index}, item) for item in value]"
+            else:
+                converted = f"build(type_{index}, value)"
+            value = f"None if value is None else {converted}"
+        if direct and name.isidentifier() and not keyword.iskeyword(name):
+            lines.append(f"    obj.{name} = {value}")
+        else:
+            lines.append(f"    setattr(obj, {name!r}, {value})")
+    lines.append("    return obj")
+    exec(compile("\n".join(lines), f"<builder {cls.__name__}>", "exec"), namespace)
+    builder = _builders[key] = namespace["builder"]
+    return builder
+
+
+class ReferenceResolver:
+    def __init__(self):
+        self._objects = {}
+
+    def build(self, cls, data):
+        if REF in data:
+            return self._reference(data)
+        obj = cls.__new__(cls)
+        if ID in data:
+            self._objects[data[ID]] = obj
+        nested = _nested_types(cls)
+        for name, value in data.items():
+            if name != ID:
+                _check_name(cls, name)
+                object.__setattr__(obj, name, self._value(nested.get(name), value))
+        return obj
+
+    def _value(self, spec, value):
+        if value is None:
+            return None
+        if spec is None:
+            return self._plain(value)
+        if isinstance(spec, list):
+            return [self._value(spec[0], item) for item in value]
+        return self.build(spec, value)
+
+    def _plain(self, value):
+        if isinstance(value, list):
+            return [self._plain(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        if REF in value:
+            return self._reference(value)
+        result = {}
+        if ID in value:
+            self._objects[value[ID]] = result
+        for name, item in value.items():
+            if name != ID:
+                result[name] = self._plain(item)
+        return result
+
+    def _reference(self, data):
+        try:
+            return self._objects[data[REF]]
+        except KeyError:
+            raise ValueError(f"unknown reference {data[REF]!r}") from None
+
+
+def from_dict(cls, data, resolve_references=False):
+    if resolve_references:
+        return ReferenceResolver().build(cls, data)
+    return build(cls, data)
+
+
+def from_dicts(cls, rows):
+    """
+    Bulk load, the plan is only looked up again when the keys change.
+    """
+    objects = []
+    append = objects.append
+    builder = _last_builders.get(cls)
+    for data in rows:
+        if builder is not None:
+            try:
+                append(builder(data))
+                continue
+            except KeyError:
+                pass
+        append(build(cls, data))
+        builder = _last_builders[cls]
+    return objects
+
+
+def from_json(cls, text, resolve_references=False):
+    return from_dict(cls, json.loads(text), resolve_references)
+
+
+class _Address(DictMixin):
+    def __init__(self, street, city, state, zipcode):
+        self.street = street
+        self.city = city
+        self.state = state
+        self.zipcode = zipcode
+
+
+class _Staff(Employee):
+    def __init__(self, name, skills, dependents, address, reports=()):
+        super().__init__(name, skills, dependents)
+        self.address = address
+        self.reports = list(reports)
+
+
+# Assigned after the class statement, the class cannot name itself before.
+_Staff.nested_types = {"address": _Address, "reports": [_Staff]}
+
+
+def _construct(data):
+    address = data["address"]
+    return _Staff(
+        data["name"],
+        data["skills"],
+        data["dependents"],
+        _Address(
+            address["street"], address["city"], address["state"], address["zipcode"]
+        ),
+        [_construct(report) for report in data["reports"]],
+    )
+
+
+def _roster(size):
+    staff = []
+    for i in range(size):
+        address = _Address(f"{i} Main St", "Concord", "NH", "03301")
+        report = _Staff(f"Report {i}", [], {}, address)
+        staff.append(
+            _Staff(f"Staff {i}", ["Python"], {"children": []}, address, [report])
+        )
+    return staff
+
+
+def _benchmark(label, rows, construct, cls):
+    assert cls.from_dict(rows[0]).to_dict() == construct(rows[0]).to_dict()
+    timings = []
+    for load in (
+        lambda: [construct(row) for row in rows],
+        lambda: [cls.from_dict(row) for row in rows],
+        lambda: from_dicts(cls, rows),
+    ):
+        # Like timeit, collections of the growing heap are kept out.
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            load()
+            timings.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    print(f"{label:<28}" + "".join(f"{seconds:>12.3f}" for seconds in timings))
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    staff_rows = [staff.to_dict() for staff in _roster(size)]
+    address_rows = [row["address"] for row in staff_rows]
+
+    print(f"{size} rows{'constructors':>30}{'from_dict':>12}{'from_dicts':>12}")
+    _benchmark(
+        "_Address, flat",
+        address_rows,
+        lambda row: _Address(row["street"], row["city"], row["state"], row["zipcode"]),
+        _Address,
+    )
+    _benchmark("_Staff, 3 objects per row", staff_rows, _construct, _Staff)
+
+    shared = _roster(1)[0]
+    shared.reports[0].reports.append(shared)
+    loaded = _Staff.from_dict(shared.to_shared_dict(), resolve_references=True)
+    assert loaded.reports[0].address is loaded.address
+    assert loaded.reports[0].reports[0] is loaded
+    print("\n$id/$ref: shared address and cycle restored")
+
+    odd = _Address.from_dict({"class": "A", "street 2": "", "zipcode": "03301"})
+    assert getattr(odd, "class") == "A" and getattr(odd, "street 2") == ""
+    try:
+        _Address.from_dict({"__class__": _Staff})
+    except ValueError as error:
+        print(error)
@@ -12,32 +12,125 @@ class Employee:
         self.payroll = payroll
 
     def work(self, hours):
-        duties = self.role.perform_duties(hours)
+        duties = self.track_work(hours)
         print(f"Employee {self.id} - {self.name}:")
         print(f"- {duties}")
         print("")
+
+    def track_work(self, hours):
+        duties = self.role.perform_duties(hours)
         self.payroll.track_work(hours)
+        return duties
 
     def calculate_payroll(self):
         return self.payroll.calculate_payroll()
 
 
+class EmployeeRows:
+    """
+    In-memory employee rows. Storage backends provide the same interface.
+    """
+
+    def __init__(self, rows):
+        self._rows = {row["id"]: row for row in rows}
+
+    def __iter__(self):
+        return iter(list(self._rows.values()))
+
+    def get(self, employee_id):
+        return self._rows.get(employee_id)
+
+    def append(self, row):
+        self._rows[row["id"]] = row
+
+    def update(self, employee_id, changes):
+        self._rows[employee_id].update(changes)
+
+    def remove(self, employee_id):
+        del self._rows[employee_id]
+
+
 class EmployeeDatabase:
-    def __init__(self):
-        self._employees = [
-            {"id": 1, "name": "Mary Poppins", "role": "manager"},
-            {"id": 2, "name": "John Smith", "role": "secretary"},
-            {"id": 3, "name": "Kevin Bacon", "role": "sales"},
-            {"id": 4, "name": "Jane Doe", "role": "factory"},
-            {"id": 5, "name": "Robin Williams", "role": "secretary"},
-        ]
-        self.productivity = ProductivitySystem()
-        self.payroll = PayrollSystem()
-        self.employee_addresses = AddressBook()
+    def __init__(
+        self, employees=None, productivity=None, payroll=None, employee_addresses=None
+    ):
+        if employees is None:
+            employees = EmployeeRows(
+                [
+                    {"id": 1, "name": "Mary Poppins", "role": "manager"},
+                    {"id": 2, "name": "John Smith", "role": "secretary"},
+                    {"id": 3, "name": "Kevin Bacon", "role": "sales"},
+                    {"id": 4, "name": "Jane Doe", "role": "factory"},
+                    {"id": 5, "name": "Robin Williams", "role": "secretary"},
+                ]
+            )
+        self._employees = employees
+        self.productivity = productivity or ProductivitySystem()
+        self.payroll = payroll or PayrollSystem()
+        self.employee_addresses = employee_addresses or AddressBook()
+        # Identity map: employee id -> (row the employee was built from, Employee)
+        self._registry = {}
+
+    @classmethod
+    def from_storage(cls, storage):
+        """
+        Employee rows are streamed from storage on every iteration, merged
+        with the policies and addresses streams of the same connection.
+        Single employees look their policy and address up by id.
+        """
+        return cls(
+            employees=storage.employees(),
+            payroll=PayrollSystem(storage.policies()),
+            employee_addresses=storage.addresses(),
+        )
 
     @property
     def employees(self):
-        return [self._create_employee(**data) for data in self._employees]
+        return list(self.iter_employees())
+
+    def iter_employees(self, cache=True):
+        """
+        Lazily yields employees, building only the ones not built yet or whose
+        row changed since they were built. With cache=False employees are
+        built fresh and not kept, so memory stays flat on large rosters.
+        """
+        for data in self._employees:
+            if cache:
+                yield self._get_or_create(data)
+            else:
+                yield self._create_employee(**data)
+
+    def get_employee(self, employee_id):
+        data = self._employees.get(employee_id)
+        if data is None:
+            raise ValueError(employee_id)
+        return self._get_or_create(data)
+
+    def add_employee(self, id, name, role):
+        self._employees.append({"id": id, "name": name, "role": role})
+
+    def update_employee(self, employee_id, **changes):
+        if self._employees.get(employee_id) is None:
+            raise ValueError(employee_id)
+        self._employees.update(employee_id, changes)
+
+    def remove_employee(self, employee_id):
+        self._employees.remove(employee_id)
+        self.invalidate(employee_id)
+
+    def invalidate(self, employee_id=None):
+        if employee_id is None:
+            self._registry.clear()
+        else:
+            self._registry.pop(employee_id, None)
+
+    def _get_or_create(self, data):
+        row = tuple(data.items())
+        cached = self._registry.get(data["id"])
+        if cached is None or cached[0] != row:
+            cached = (row, self._create_employee(**data))
+            self._registry[data["id"]] = cached
+        return cached[1]
 
     def _create_employee(self, id, name, role):
         address = self.employee_addresses.get_employee_address(id)
@@ -0,0 +1,485 @@
+"""
+Batch export of same-typed DictMixin objects.
+
+Exporting a roster used to mean one to_dict per object. The exporter infers
+the schema once from the first object instead: attributes of nested objects
+are flattened into dotted column names (address.city), everything else
+(scalars, lists, dicts) is one column. A row function reading exactly those
+attributes is compiled for the schema, like the serializers of mixin.py.
+
+Rows are encoded in chunks of chunk_size objects and every chunk is written
+with one call:
+- export_csv: a header row and one row per object, lists and dicts as JSON
+- export_jsonl: one flat JSON object per line, keys are the column names
+- export_columns: a directory with schema.json and one binary file per
+  column, int64 (q), float64 (d) or bool (b) arrays, and for text columns a
+  .lengths file of int64 byte lengths next to the UTF-8 .bin data. A typed
+  column with missing values (None) is marked nullable in schema.json and
+  gets a .valid file, one byte per row, 0 where the value is missing. An
+  int column that later meets a float is widened to float64, a bool column
+  only takes bools
+
+With workers, chunks are encoded in a process pool. Rows are extracted in
+this process, so only plain tuples are pickled, and chunks are written in
+input order.
+"""
+
+import csv
+import io
+import json
+import os
+import sys
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain, islice
+
+from mixin import SCALARS, DictMixin, convert, uses_default_serialization
+
+# Binary column types, the text ones hold UTF-8 (str) or JSON (json).
+INT, FLOAT, BOOL, STR, JSON = "int", "float", "bool", "str", "json"
+TYPECODES = {INT: "q", FLOAT: "d", BOOL: "b"}
+
+
+def _flattened(value):
+    # Objects serialized through their attributes, see DictMixin._traverse.
+    if isinstance(value, DictMixin):
+        return uses_default_serialization(type(value))
+    return not isinstance(value, (dict, list)) and hasattr(value, "__dict__")
+
+
+def _column_type(value):
+    if isinstance(value, bool):
+        return BOOL
+    if isinstance(value, int):
+        return INT
+    if isinstance(value, float):
+        return FLOAT
+    if isinstance(value, str):
+        return STR
+    return JSON
+
+
+class Schema:
+    def __init__(self, paths, types):
+        self.paths = paths
+        self.types = types
+        self.columns = [".".join(path) for path in paths]
+        self.row = self._compile()
+
+    @classmethod
+    def infer(cls, obj):
+        if not _flattened(obj):
+            raise ValueError(f"{type(obj).__name__} has a custom to_dict")
+        paths = []
+        types = []
+        stack = [((), iter(obj.__dict__.items()))]
+        while stack:
+            prefix, fields = stack[-1]
+            field = next(fields, None)
+            if field is None:
+                stack.pop()
+                continue
+            name, value = field
+            path = prefix + (name,)
+            if _flattened(value):
+                stack.append((path, iter(value.__dict__.items())))
+            else:
+                paths.append(path)
+                types.append(_column_type(value))
+        return cls(paths, types)
+
+    def _compile(self):
+        lines = ["def row(obj):", "    try:", "        o0 = obj.__dict__"]
+        objects = {(): "o0"}
+        values = []
+        for index, path in enumerate(self.paths):
+            for depth in range(1, len(path)):
+                prefix = path[:depth]
+                if prefix not in objects:
+                    name = objects[prefix] = f"o{len(objects)}"
+                    lines.append(
+                        f"        {name} = "
+                        f"{objects[prefix[:-1]]}[{prefix[-1]!r}].__dict__"
+                    )
+            lines.append(f"        v = {objects[path[:-1]]}[{path[-1]!r}]")
+            lines.append(
+                f"        v{index} = v if type(v) in scalars else convert(v)"
+            )
+            values.append(f"v{index}")
+        lines.append(f"        return ({', '.join(values)}{',' if values else ''})")
+        lines.append("    except (AttributeError, KeyError):")
+        lines.append("        return lookup(obj)")
+        namespace = {
+            "scalars": SCALARS,
+            "convert": convert,
+            "lookup": self._lookup,
+        }
+        exec(compile("\n".join(lines), "<export row>", "exec"), namespace)
+        return namespace["row"]
+
+    def _lookup(self, obj):
+        """
+        Slow path for objects missing an attribute of the schema, the
+        missing columns are None (nullable in export_columns).
+        """
+        row = []
+        for path in self.paths:
+            value = obj
+            for name in path:
+                value = getattr(value, "__dict__", {}).get(name)
+                if value is None:
+                    break
+            row.append(value if type(value) in SCALARS else convert(value))
+        return tuple(row)
+
+
+def _encode_csv(json_indexes, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if json_indexes:
+        dumps = json.dumps
+        rows = [list(row) for row in rows]
+        for row in rows:
+            for index in json_indexes:
+                row[index] = dumps(row[index])
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def _encode_jsonl(columns, rows):
+    dumps = json.dumps
+    return "".join([dumps(dict(zip(columns, row))) + "\n" for row in rows])
+
+
+def _encode_columns(columns, types, rows):
+    """
+    Returns (data, lengths, valid, type) per column. valid is None unless the
+    column has missing values, these are stored as 0, False or "". type is
+    FLOAT for an int column holding floats in this chunk.
+    """
+    encoded = []
+    for index, (column, column_type) in enumerate(zip(columns, types)):
+        values = [row[index] for row in rows]
+        valid = None
+        if column_type != JSON and None in values:
+            valid = bytes([value is not None for value in values])
+            missing = {STR: "", BOOL: False}.get(column_type, 0)
+            values = [missing if value is None else value for value in values]
+        if column_type == INT and float in set(map(type, values)):
+            column_type = FLOAT
+        if column_type == BOOL:
+            for value in values:
+                if type(value) is not bool:
+                    raise ValueError(
+                        f"column {column!r} holds bool values, got "
+                        f"{type(value).__name__}"
+                    )
+        typecode = TYPECODES.get(column_type)
+        if typecode is not None:
+            try:
+                encoded.append(
+                    (array(typecode, values).tobytes(), None, valid, column_type)
+                )
+            except (TypeError, OverflowError):
+                raise ValueError(
+                    f"column {column!r} holds {column_type} values, got "
+                    f"{sorted({type(v).__name__ for v in values})}"
+                ) from None
+            continue
+        if column_type == STR:
+            for value in values:
+                if not isinstance(value, str):
+                    raise ValueError(
+                        f"column {column!r} holds str values, got "
+                        f"{type(value).__name__}"
+                    )
+        else:
+            values = [json.dumps(value) for value in values]
+        data = [value.encode("utf-8") for value in values]
+        lengths = array("q", map(len, data)).tobytes()
+        encoded.append((b"".join(data), lengths, valid, column_type))
+    return encoded
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _encoded_chunks(encode, schema, objects, chunk_size, workers):
+    """
+    Yields (number of rows, encode(rows)) for every chunk of objects, in
+    input order.
+    """
+    row = schema.row
+    chunks = ([row(obj) for obj in chunk] for chunk in _chunks(objects, chunk_size))
+    if not workers:
+        for rows in chunks:
+            yield len(rows), encode(rows)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # A bounded window of chunks in flight keeps memory flat.
+        pending = deque()
+        for rows in chunks:
+            pending.append((len(rows), executor.submit(encode, rows)))
+            if len(pending) >= 2 * workers:
+                count, future = pending.popleft()
+                yield count, future.result()
+        while pending:
+            count, future = pending.popleft()
+            yield count, future.result()
+
+
+def _start(objects):
+    """
+    Returns (schema, objects) with the first object put back, or
+    (None, ()) when there is nothing to export.
+    """
+    iterator = iter(objects)
+    first = next(iterator, None)
+    if first is None:
+        return None, ()
+    return Schema.infer(first), chain([first], iterator)
+
+
+def export_csv(objects, path, chunk_size=10_000, workers=None):
+    """
+    Returns the number of exported objects, like the other exporters.
+    """
+    schema, objects = _start(objects)
+    count = 0
+    with open(path, "w", newline="") as csv_file:
+        if schema is None:
+            return count
+        csv.writer(csv_file, lineterminator="\n").writerow(schema.columns)
+        json_indexes = [
+            index
+            for index, column_type in enumerate(schema.types)
+            if column_type == JSON
+        ]
+        encode = partial(_encode_csv, json_indexes)
+        for rows, text in _encoded_chunks(encode, schema, objects, chunk_size, workers):
+            csv_file.write(text)
+            count += rows
+    return count
+
+
+def export_jsonl(objects, path, chunk_size=10_000, workers=None):
+    schema, objects = _start(objects)
+    count = 0
+    with open(path, "w") as jsonl_file:
+        if schema is None:
+            return count
+        encode = partial(_encode_jsonl, schema.columns)
+        for rows, text in _encoded_chunks(encode, schema, objects, chunk_size, workers):
+            jsonl_file.write(text)
+            count += rows
+    return count
+
+
+def export_columns(objects, directory, chunk_size=10_000, workers=None):
+    schema, objects = _start(objects)
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    if schema is None:
+        _write_schema(directory, [], [], count)
+        return count
+    bases = [os.path.join(directory, column) for column in schema.columns]
+    types = list(schema.types)
+    files = []
+    # Opened on the first missing value, earlier rows are all valid.
+    valid_files = {}
+    try:
+        for base, column_type in zip(bases, schema.types):
+            # Readable too, widening an int column rewrites what was written.
+            data_file = open(base + ".bin", "w+b")
+            lengths_file = None
+            if column_type not in TYPECODES:
+                lengths_file = open(base + ".lengths", "wb")
+            files.append((data_file, lengths_file))
+        encode = partial(_encode_columns, schema.columns, schema.types)
+        for rows, encoded in _encoded_chunks(
+            encode, schema, objects, chunk_size, workers
+        ):
+            for index, (data, lengths, valid, column_type) in enumerate(encoded):
+                data_file, lengths_file = files[index]
+                if column_type != types[index]:
+                    if types[index] == INT:
+                        _widen(data_file)
+                        types[index] = FLOAT
+                    else:
+                        # Int chunk of a column already widened.
+                        data = _floats(data)
+                data_file.write(data)
+                if lengths_file is not None:
+                    lengths_file.write(lengths)
+                valid_file = valid_files.get(index)
+                if valid is not None and valid_file is None:
+                    valid_file = open(bases[index] + ".valid", "wb")
+                    valid_files[index] = valid_file
+                    valid_file.write(b"\1" * count)
+                if valid_file is not None:
+                    valid_file.write(b"\1" * rows if valid is None else valid)
+            count += rows
+    finally:
+        for data_file, lengths_file in files:
+            data_file.close()
+            if lengths_file is not None:
+                lengths_file.close()
+        for valid_file in valid_files.values():
+            valid_file.close()
+    nullable = [schema.columns[index] for index in valid_files]
+    _write_schema(directory, schema.columns, types, count, nullable)
+    return count
+
+
+def _floats(data):
+    values = array("q")
+    values.frombytes(data)
+    return array("d", values).tobytes()
+
+
+def _widen(data_file):
+    """
+    Rewrites the int64 values written so far as float64.
+    """
+    data_file.seek(0)
+    data = _floats(data_file.read())
+    data_file.seek(0)
+    data_file.truncate()
+    data_file.write(data)
+
+
+def _write_schema(directory, columns, types, rows, nullable=()):
+    entries = []
+    for column, column_type in zip(columns, types):
+        entry = {"name": column, "type": column_type}
+        if column in nullable:
+            entry["nullable"] = True
+        entries.append(entry)
+    with open(os.path.join(directory, "schema.json"), "w") as schema_file:
+        json.dump({"rows": rows, "columns": entries}, schema_file)
+
+
+def read_columns(directory):
+    """
+    Returns {column: list of values} of a directory written by
+    export_columns.
+    """
+    with open(os.path.join(directory, "schema.json")) as schema_file:
+        schema = json.load(schema_file)
+    columns = {}
+    for column in schema["columns"]:
+        name, column_type = column["name"], column["type"]
+        base = os.path.join(directory, name)
+        with open(base + ".bin", "rb") as data_file:
+            data = data_file.read()
+        typecode = TYPECODES.get(column_type)
+        if typecode is not None:
+            values = array(typecode)
+            values.frombytes(data)
+            values = values.tolist()
+            if column_type == BOOL:
+                values = list(map(bool, values))
+        else:
+            lengths = array("q")
+            with open(base + ".lengths", "rb") as lengths_file:
+                lengths.frombytes(lengths_file.read())
+            values = []
+            position = 0
+            for length in lengths:
+                text = data[position : position + length].decode("utf-8")
+                values.append(text if column_type == STR else json.loads(text))
+                position += length
+        if column.get("nullable"):
+            with open(base + ".valid", "rb") as valid_file:
+                valid = valid_file.read()
+            values = [value if ok else None for value, ok in zip(values, valid)]
+        columns[name] = values
+    return columns
+
+
+class _Address(DictMixin):
+    def __init__(self, i):
+        self.street = f"{i} Main St"
+        self.city = ["Concord", "Manchester", "Keene"][i % 3]
+        self.zipcode = f"03{i % 1000:03}"
+
+
+class _Employee(DictMixin):
+    def __init__(self, i):
+        self.id = i
+        self.name = f"Employee {i}"
+        self.rate = 9 + i % 30 * 0.5
+        self.active = i % 7 != 0
+        self.skills = ["Python", "Payroll"][: i % 3]
+        self.address = _Address(i)
+
+
+def _per_object_jsonl(objects, path):
+    with open(path, "w") as jsonl_file:
+        for obj in objects:
+            jsonl_file.write(json.dumps(obj.to_dict()) + "\n")
+
+
+def _timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    roster = [_Employee(i) for i in range(size)]
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {
+            name: os.path.join(directory, name)
+            for name in ("objects.jsonl", "roster.csv", "roster.jsonl", "columns")
+        }
+        parallel = {"workers": 2}
+        print(f"{size} employees{'seconds':>20}")
+        for label, function, args, kwargs in (
+            ("to_dict + json.dumps", _per_object_jsonl, ("objects.jsonl",), {}),
+            ("export_csv", export_csv, ("roster.csv",), {}),
+            ("export_jsonl", export_jsonl, ("roster.jsonl",), {}),
+            ("export_columns", export_columns, ("columns",), {}),
+            ("export_jsonl, 2 workers", export_jsonl, ("roster.jsonl",), parallel),
+        ):
+            seconds = _timed(function, roster, paths[args[0]], **kwargs)
+            print(f"{label:<28}{seconds:>10.3f}")
+
+        columns = read_columns(paths["columns"])
+        assert columns["address.city"][:3] == ["Concord", "Manchester", "Keene"]
+        assert columns["skills"][2] == ["Python", "Payroll"]
+        with open(paths["roster.jsonl"]) as jsonl_file:
+            assert json.loads(next(jsonl_file))["address.zipcode"] == "03000"
+
+        # Missing values in typed columns come back as None.
+        sparse = [_Employee(i) for i in range(5)]
+        sparse[3].rate = None
+        del sparse[4].address
+        export_columns(sparse, paths["columns"], chunk_size=2)
+        columns = read_columns(paths["columns"])
+        assert columns["rate"] == [9.0, 9.5, 10.0, None, 11.0]
+        assert columns["id"] == [0, 1, 2, 3, 4]
+        assert columns["address.city"][3:] == ["Concord", None]
+
+        # An int column widens when a later chunk holds a float.
+        for i, employee in enumerate(sparse):
+            employee.id = 1500.5 if i == 3 else i
+        export_columns(sparse, paths["columns"], chunk_size=2)
+        assert read_columns(paths["columns"])["id"] == [0.0, 1.0, 2.0, 1500.5, 4.0]
+        sparse[4].active = 2
+        try:
+            export_columns(sparse, paths["columns"], chunk_size=2)
+        except ValueError as error:
+            print(error)
@@ -0,0 +1,174 @@
+"""
+Per-period hours history with rolling year-to-date and quarter-to-date totals.
+
+HoursLedger observes track_work on every policy and keeps, per pay period,
+a cumulative hours column and a cumulative pay column with one row per
+employee. The hours or pay of any employee over any range of periods, YTD
+and QTD included, is the difference of two cumulative values, so the values
+of a single period are not stored; only the open period's hours and pay are
+kept, to update its cumulative cells. Company-wide totals are kept per
+period. Every track_work event updates O(1) cells and no report scans the
+history.
+
+The pay of a period is the policy's check amount for the hours worked in
+that period, so salaried employees are paid for every period, even without
+tracked hours.
+"""
+
+import copy
+from array import array
+
+
+class HoursLedger:
+    def __init__(
+        self, employee_policies, periods_per_quarter=13, periods_per_year=52
+    ):
+        self.periods_per_quarter = periods_per_quarter
+        self.periods_per_year = periods_per_year
+        self.period = -1
+        self._rows = {}
+        self._policies = []
+        self._policy_rows = {}
+        for employee_id, policy in employee_policies.items():
+            self._rows[employee_id] = len(self._policies)
+            self._policy_rows[policy] = len(self._policies)
+            self._policies.append(policy)
+            policy.add_observer(self._track)
+        # Hours and pay of the open period, one row per employee.
+        self._period_hours = None
+        self._period_pay = None
+        # One column per period, one row per employee.
+        self._cumulative_hours = []
+        self._cumulative_pay = []
+        # Company totals, one value per period.
+        self._total_hours = array("d")
+        self._total_pay = array("d")
+        self.advance_period()
+
+    def advance_period(self):
+        """
+        Closes the current pay period and opens the next one.
+        """
+        self.period += 1
+        size = len(self._policies)
+        hours = array("d", bytes(8 * size))
+        pay = array("d", (_pay_for(policy, 0) for policy in self._policies))
+        if self._cumulative_hours:
+            cumulative_hours = array("d", self._cumulative_hours[-1])
+            cumulative_pay = array("d", self._cumulative_pay[-1])
+            for row in range(size):
+                cumulative_pay[row] += pay[row]
+        else:
+            cumulative_hours = array("d", hours)
+            cumulative_pay = array("d", pay)
+        self._period_hours = hours
+        self._period_pay = pay
+        self._cumulative_hours.append(cumulative_hours)
+        self._cumulative_pay.append(cumulative_pay)
+        self._total_hours.append(0)
+        self._total_pay.append(sum(pay))
+
+    def _track(self, policy, hours):
+        row = self._policy_rows[policy]
+        period_hours = self._period_hours[row] + hours
+        self._period_hours[row] = period_hours
+        self._cumulative_hours[-1][row] += hours
+        self._total_hours[-1] += hours
+
+        pay = _pay_for(policy, period_hours)
+        change = pay - self._period_pay[row]
+        self._period_pay[row] = pay
+        self._cumulative_pay[-1][row] += change
+        self._total_pay[-1] += change
+
+    def close(self):
+        for policy in self._policies:
+            policy.remove_observer(self._track)
+
+    # Range queries, periods are [start, stop).
+    def hours(self, employee_id, start, stop):
+        return self._range(self._cumulative_hours, employee_id, start, stop)
+
+    def pay(self, employee_id, start, stop):
+        return self._range(self._cumulative_pay, employee_id, start, stop)
+
+    def _range(self, cumulative, employee_id, start, stop):
+        row = self._rows[employee_id]
+        stop = min(stop, self.period + 1)
+        start = max(start, 0)
+        if stop <= start:
+            return 0.0
+        before = cumulative[start - 1][row] if start else 0.0
+        return cumulative[stop - 1][row] - before
+
+    @property
+    def year_start(self):
+        return self.period - self.period % self.periods_per_year
+
+    @property
+    def quarter_start(self):
+        in_year = self.period % self.periods_per_year
+        return self.year_start + in_year - in_year % self.periods_per_quarter
+
+    def ytd_hours(self, employee_id):
+        return self.hours(employee_id, self.year_start, self.period + 1)
+
+    def qtd_hours(self, employee_id):
+        return self.hours(employee_id, self.quarter_start, self.period + 1)
+
+    def ytd_pay(self, employee_id):
+        return self.pay(employee_id, self.year_start, self.period + 1)
+
+    def qtd_pay(self, employee_id):
+        return self.pay(employee_id, self.quarter_start, self.period + 1)
+
+    def company_hours(self, start, stop):
+        return sum(self._total_hours[max(start, 0) : stop])
+
+    def company_pay(self, start, stop):
+        return sum(self._total_pay[max(start, 0) : stop])
+
+
+def _pay_for(policy, hours):
+    """
+    Check amount of policy for the given hours, the policy is not changed.
+    """
+    if _computes_for_hours(type(policy)):
+        return policy.calculate_payroll_for(hours)
+    # A subclass overriding calculate_payroll only, evaluated on a copy.
+    other = copy.copy(policy)
+    other.hours_worked = hours
+    return other.calculate_payroll()
+
+
+def _computes_for_hours(cls):
+    """
+    True when the class defining calculate_payroll also defines
+    calculate_payroll_for, so both compute the same amount.
+    """
+    for base in cls.__mro__:
+        if "calculate_payroll" in base.__dict__:
+            return "calculate_payroll_for" in base.__dict__
+    return False
+
+
+if __name__ == "__main__":
+    from payroll_system import PayrollSystem
+
+    payroll_system = PayrollSystem()
+    ledger = payroll_system.hours_ledger()
+    for week in range(16):
+        for employee_id in (3, 4, 5):
+            payroll_system.get_policy(employee_id).track_work(40)
+        ledger.advance_period()
+
+    print(f"Period {ledger.period}, quarter started at {ledger.quarter_start}")
+    columns = ("YTD hours", "QTD hours", "YTD pay", "QTD pay")
+    print(f"{'employee':>8}" + "".join(f"{column:>11}" for column in columns))
+    for employee_id in range(1, 6):
+        print(
+            f"{employee_id:>8}{ledger.ytd_hours(employee_id):>11.0f}"
+            f"{ledger.qtd_hours(employee_id):>11.0f}"
+            f"{ledger.ytd_pay(employee_id):>11.2f}{ledger.qtd_pay(employee_id):>11.2f}"
+        )
+    print(f"Company pay weeks 0-4: {ledger.company_pay(0, 4):.2f}")
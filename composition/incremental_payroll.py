@@ -0,0 +1,92 @@
+"""
+Incremental payroll runs.
+
+The engine observes track_work on every policy it knows about and keeps the
+ids of the employees whose policy changed since the last run. A run only
+recomputes those employees and moves the running total by the difference
+between their new and cached check amounts, so a mid-week re-run after a few
+time-clock corrections costs O(changed) instead of O(roster).
+"""
+
+import math
+
+
+class IncrementalPayroll:
+    def __init__(self, employee_policies):
+        self._policies = {}
+        self._employee_ids = {}
+        self._amounts = {}
+        self._dirty = set()
+        self.total = 0
+        for employee_id, policy in employee_policies.items():
+            self.set_policy(employee_id, policy)
+
+    def set_policy(self, employee_id, policy):
+        """
+        Adds an employee or swaps their policy (e.g. salary to hourly).
+        """
+        if employee_id in self._policies:
+            self.remove(employee_id)
+        self._policies[employee_id] = policy
+        self._employee_ids[policy] = employee_id
+        policy.add_observer(self._mark_dirty)
+        self._dirty.add(employee_id)
+
+    def remove(self, employee_id):
+        policy = self._policies.pop(employee_id)
+        policy.remove_observer(self._mark_dirty)
+        del self._employee_ids[policy]
+        self._dirty.discard(employee_id)
+        self.total -= self._amounts.pop(employee_id, 0)
+
+    def _mark_dirty(self, policy, hours):
+        self._dirty.add(self._employee_ids[policy])
+
+    @property
+    def dirty(self):
+        return frozenset(self._dirty)
+
+    def run(self):
+        """
+        Recomputes the changed employees and returns the payroll total.
+        """
+        for employee_id in self._dirty:
+            amount = self._policies[employee_id].calculate_payroll()
+            self.total += amount - self._amounts.get(employee_id, 0)
+            self._amounts[employee_id] = amount
+        self._dirty.clear()
+        return self.total
+
+    def check_amount(self, employee_id):
+        if employee_id in self._dirty:
+            self.run()
+        return self._amounts[employee_id]
+
+    def resync(self):
+        """
+        Float deltas can drift after many runs, this rebuilds the running
+        total from the cached amounts.
+        """
+        self.run()
+        self.total = math.fsum(self._amounts.values())
+        return self.total
+
+    def close(self):
+        for employee_id in list(self._policies):
+            self.remove(employee_id)
+
+
+if __name__ == "__main__":
+    from payroll_system import PayrollSystem
+
+    payroll_system = PayrollSystem()
+    engine = payroll_system.incremental()
+    print(f"Initial total: {engine.run()}")
+
+    payroll_system.get_policy(4).track_work(40)
+    payroll_system.get_policy(3).track_work(10)
+    print(f"Changed since last run: {sorted(engine.dirty)}")
+    print(f"Re-run total: {engine.run()}")
+
+    payroll_system.get_policy(4).track_work(-2)
+    print(f"After a correction: {engine.run()}")
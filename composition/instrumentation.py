@@ -0,0 +1,220 @@
+"""
+Opt-in instrumentation for the payroll and productivity hot paths.
+
+Nothing is measured until enable() is called: it swaps the instrumented
+methods on their classes for timing wrappers, and disable() puts the original
+functions back. A disabled run executes exactly the original code, so it costs
+nothing, which the benchmark at the bottom of this module shows.
+
+Collected metrics:
+- calls and cumulative seconds per policy type and method
+  (calculate_payroll, track_work)
+- calls and cumulative seconds per role type for perform_duties
+- employee constructions and their cumulative seconds
+- calls and cumulative seconds of PayrollSystem.calculate_payroll and
+  ProductivitySystem.track
+
+export() writes them in the Prometheus text exposition format.
+"""
+
+import sys
+import time
+from collections import defaultdict
+from functools import wraps
+
+from compiler import compiler
+from employees import EmployeeDatabase
+from payroll_system import (
+    CommissionPolicy,
+    HourlyPolicy,
+    PayrollPolicy,
+    PayrollSystem,
+    SalaryPolicy,
+)
+from productivity import (
+    FactoryRole,
+    ManagerRole,
+    ProductivitySystem,
+    SalesRole,
+    SecretaryRole,
+)
+
+POLICY_TYPES = (SalaryPolicy, HourlyPolicy, CommissionPolicy)
+ROLE_TYPES = (ManagerRole, SecretaryRole, SalesRole, FactoryRole)
+
+METRICS = {
+    "payroll_policy_calls_total": (
+        "payroll_policy_seconds_total",
+        "Policy method calls by policy type.",
+    ),
+    "productivity_role_calls_total": (
+        "productivity_role_seconds_total",
+        "perform_duties calls by role type.",
+    ),
+    "employee_constructions_total": (
+        "employee_construction_seconds_total",
+        "Employees built by EmployeeDatabase.",
+    ),
+    "system_calls_total": (
+        "system_seconds_total",
+        "Top-level PayrollSystem and ProductivitySystem runs.",
+    ),
+}
+
+
+class Instrumentation:
+    def __init__(self, policy_types=POLICY_TYPES, role_types=ROLE_TYPES):
+        self._targets = []
+        # track_work is inherited from PayrollPolicy, calls are still labelled
+        # with the concrete policy type.
+        for policy_type in (PayrollPolicy,) + tuple(policy_types):
+            for method in ("calculate_payroll", "track_work"):
+                self._targets.append(
+                    (policy_type, method, "payroll_policy_calls_total", "policy")
+                )
+        for role_type in role_types:
+            self._targets.append(
+                (role_type, "perform_duties", "productivity_role_calls_total", "role")
+            )
+        self._targets.append(
+            (EmployeeDatabase, "_create_employee", "employee_constructions_total", None)
+        )
+        self._targets.append(
+            (PayrollSystem, "calculate_payroll", "system_calls_total", "system")
+        )
+        self._targets.append(
+            (ProductivitySystem, "track", "system_calls_total", "system")
+        )
+        self._originals = {}
+        self._active = {}
+        self.reset()
+
+    @property
+    def enabled(self):
+        return bool(self._originals)
+
+    def reset(self):
+        # metric -> labels -> [calls, seconds], cleared in place so enabled
+        # wrappers keep counting into the same dictionaries.
+        if not hasattr(self, "metrics"):
+            self.metrics = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+        for counters in self.metrics.values():
+            for counter in counters.values():
+                counter[0] = 0
+                counter[1] = 0.0
+
+    def enable(self):
+        if self.enabled:
+            return
+        for cls, method, metric, label in self._targets:
+            original = cls.__dict__.get(method)
+            if original is None:
+                continue
+            self._originals[(cls, method)] = original
+            setattr(cls, method, self._wrap(original, method, metric, label))
+        compiler.invalidate()
+
+    def disable(self):
+        for (cls, method), original in self._originals.items():
+            setattr(cls, method, original)
+        self._originals = {}
+        compiler.invalidate()
+
+    def _wrap(self, function, method, metric, label):
+        clock = time.perf_counter
+        counters = self.metrics[metric]
+        # Shared by every wrapper of the same metric.
+        active = self._active.setdefault(metric, [False])
+        by_type = {}
+
+        def counter_for(obj_type):
+            if label is None:
+                key = ()
+            elif label == "role":
+                key = (("role", obj_type.__name__),)
+            else:
+                key = ((label, obj_type.__name__), ("method", method))
+            counter = by_type[obj_type] = counters[key]
+            return counter
+
+        @wraps(function)
+        def wrapper(obj, *args, **kwargs):
+            # CommissionPolicy reaches SalaryPolicy through super(), only the
+            # outermost call of a nested chain of one metric is recorded.
+            if active[0]:
+                return function(obj, *args, **kwargs)
+            active[0] = True
+            start = clock()
+            try:
+                return function(obj, *args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                active[0] = False
+                counter = by_type.get(type(obj)) or counter_for(type(obj))
+                counter[0] += 1
+                counter[1] += elapsed
+
+        return wrapper
+
+    def render(self):
+        lines = []
+        for calls_name, (seconds_name, help_text) in METRICS.items():
+            counters = self.metrics.get(calls_name, {})
+            for name, index in ((calls_name, 0), (seconds_name, 1)):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for key, values in sorted(counters.items()):
+                    labels = ",".join(f'{k}="{v}"' for k, v in key)
+                    labels = f"{{{labels}}}" if labels else ""
+                    lines.append(f"{name}{labels} {values[index]}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        with open(path, "w") as metrics_file:
+            metrics_file.write(self.render())
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+
+def _payroll_run(policies):
+    for policy in policies:
+        policy.hours_worked = 0
+    start = time.perf_counter()
+    for policy in policies:
+        policy.track_work(1)
+        policy.calculate_payroll()
+    return time.perf_counter() - start
+
+
+def _best_run(policies, repeat=9):
+    return min(_payroll_run(policies) for _ in range(repeat))
+
+
+if __name__ == "__main__":
+    from load_test import synthetic_policies
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    policies = synthetic_policies(size)
+
+    baseline = _best_run(policies)
+    instrumentation = Instrumentation()
+    instrumentation.enable()
+    instrumented = _best_run(policies)
+    instrumentation.disable()
+    disabled = _best_run(policies)
+
+    print(f"{size} policies, track_work + calculate_payroll, best of 9")
+    print(f"{'mode':<14}{'seconds':>10}{'overhead':>10}")
+    for mode, seconds in (
+        ("baseline", baseline),
+        ("disabled", disabled),
+        ("enabled", instrumented),
+    ):
+        print(f"{mode:<14}{seconds:>10.4f}{(seconds / baseline - 1) * 100:>9.1f}%")
+    print()
+    print(instrumentation.render(), end="")
@@ -0,0 +1,235 @@
+"""
+Streaming JSON encoder for DictMixin object graphs.
+
+JSONMixin.to_json used to build the whole dict with to_dict, turn it into one
+string with json.dumps and print it, and the recursion in _traverse fails on
+deep graphs. StreamEncoder walks the graph with an explicit stack of
+iterators instead, reading the attributes of every object in place, and
+yields the JSON text in chunks of about chunk_size characters. Memory use is
+set by the chunk size plus one iterator per open level of nesting, and the
+depth is only limited by memory.
+
+The output is the same text json.dumps(obj.to_dict()) produces. Tuples are
+written as lists, like json.dumps does, and a container reached again while
+it is still open raises ValueError("Circular reference detected").
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+from json.encoder import encode_basestring_ascii
+
+from mixin import DictMixin, uses_default_serialization
+
+_END = object()
+
+INFINITY = float("inf")
+
+
+def _float(value):
+    # Same spelling as json.dumps with the default allow_nan=True.
+    if value != value:
+        return "NaN"
+    if value == INFINITY:
+        return "Infinity"
+    if value == -INFINITY:
+        return "-Infinity"
+    return float.__repr__(value)
+
+
+def _scalar(value):
+    """
+    Encoded value, or None when value is a container.
+    """
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if isinstance(value, float):
+        return _float(value)
+    return None
+
+
+def _key(key):
+    if isinstance(key, str):
+        return encode_basestring_ascii(key)
+    if isinstance(key, (int, float)) or key is None:
+        return encode_basestring_ascii(_scalar(key))
+    raise TypeError(
+        f"keys must be str, int, float, bool or None, not {type(key).__name__}"
+    )
+
+
+def _open(value):
+    """
+    Returns (opening, iterator, closing, is_object) for a container, in the
+    same order of checks as DictMixin._traverse.
+    """
+    if isinstance(value, DictMixin):
+        if uses_default_serialization(type(value)):
+            return "{", iter(value.__dict__.items()), "}", True
+        # Custom serialization, only its result is streamed.
+        return "{", iter(value.to_dict().items()), "}", True
+    if isinstance(value, dict):
+        return "{", iter(value.items()), "}", True
+    if isinstance(value, (list, tuple)):
+        return "[", iter(value), "]", False
+    if hasattr(value, "__dict__"):
+        return "{", iter(value.__dict__.items()), "}", True
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class StreamEncoder:
+    def __init__(self, chunk_size=65536):
+        self.chunk_size = chunk_size
+
+    def tokens(self, obj):
+        """
+        Yields the JSON text of obj piece by piece, without recursion.
+        """
+        # Open containers: [iterator, closing, is_object, first, id].
+        stack = []
+        active = set()
+        value = obj
+        while True:
+            encoded = _scalar(value)
+            if encoded is not None:
+                yield encoded
+            else:
+                key = id(value)
+                if key in active:
+                    raise ValueError("Circular reference detected")
+                opening, iterator, closing, is_object = _open(value)
+                yield opening
+                active.add(key)
+                stack.append([iterator, closing, is_object, True, key])
+
+            while stack:
+                frame = stack[-1]
+                item = next(frame[0], _END)
+                if item is _END:
+                    stack.pop()
+                    active.discard(frame[4])
+                    yield frame[1]
+                    continue
+                separator = "" if frame[3] else ", "
+                frame[3] = False
+                if frame[2]:
+                    key, value = item
+                    yield f"{separator}{_key(key)}: "
+                else:
+                    value = item
+                    if separator:
+                        yield separator
+                break
+            else:
+                return
+
+    def iterencode(self, obj):
+        """
+        Yields the JSON text of obj in chunks of about chunk_size characters.
+        """
+        chunk_size = self.chunk_size
+        pieces = []
+        size = 0
+        for token in self.tokens(obj):
+            pieces.append(token)
+            size += len(token)
+            if size >= chunk_size:
+                yield "".join(pieces)
+                pieces = []
+                size = 0
+        if pieces:
+            yield "".join(pieces)
+
+    def encode(self, obj):
+        return "".join(self.iterencode(obj))
+
+    def dump(self, obj, fp):
+        """
+        Writes obj to a text file, or to a socket (anything with sendall)
+        as ASCII bytes.
+        """
+        write = getattr(fp, "write", None)
+        if write is None:
+            sendall = fp.sendall
+            for chunk in self.iterencode(obj):
+                sendall(chunk.encode("ascii"))
+            return
+        for chunk in self.iterencode(obj):
+            write(chunk)
+
+
+def dump(obj, fp, chunk_size=65536):
+    StreamEncoder(chunk_size).dump(obj, fp)
+
+
+class _Link(DictMixin):
+    def __init__(self, position, next_link=None):
+        self.position = position
+        self.label = f"link {position}"
+        self.next_link = next_link
+
+
+class _Record(DictMixin):
+    def __init__(self, i):
+        self.id = i
+        self.name = f"Employee {i}"
+        self.skills = ["Python", "Payroll", i * 0.5]
+        self.dependents = {"children": [f"Child {i}"], "spouse": None}
+
+
+def _peak(function):
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        return elapsed, tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    import io
+    import os
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    roster = _Link(0, [_Record(i) for i in range(size)])
+    assert StreamEncoder(64).encode(roster) == json.dumps(roster.to_dict())
+
+    with open(os.devnull, "w") as devnull:
+        print(f"{size} records{'seconds':>16}{'peak MiB':>10}")
+        to_dict_dumps = lambda: devnull.write(json.dumps(roster.to_dict()))  # noqa
+        for label, function in (
+            ("json.dumps(to_dict())", to_dict_dumps),
+            ("dump, 64 KiB chunks", lambda: dump(roster, devnull)),
+            ("dump, 4 KiB chunks", lambda: dump(roster, devnull, 4096)),
+        ):
+            seconds, peak = _peak(function)
+            print(f"{label:<24}{seconds:>10.3f}{peak:>10.2f}")
+
+    chain = None
+    for position in range(size):
+        chain = _Link(position, chain)
+    try:
+        chain.to_dict()
+    except RecursionError:
+        print(f"\nto_dict() on a chain {size} deep: RecursionError")
+    buffer = io.StringIO()
+    dump(chain, buffer)
+    print(f"dump() on a chain {size} deep: {buffer.tell()} characters")
+
+    loop = _Link(0)
+    loop.next_link = [loop]
+    try:
+        dump(loop, io.StringIO())
+    except ValueError as error:
+        print(f"dump() on a cycle: {error}")
@@ -0,0 +1,235 @@
+"""
+Load test for the program.py flow on synthetic rosters.
+
+Generates a roster of the requested size with the given role and policy
+mixes and one address per employee, then runs the same stages as program.py:
+building the employees, ProductivitySystem.track and
+PayrollSystem.calculate_payroll. Report output goes to os.devnull.
+
+For every stage it prints wall time, throughput, p50/p99 per-employee latency
+and peak traced memory. Per-employee latency is the time the stage spends
+between asking for one employee and asking for the next one.
+
+Usage: python load_test.py --size 100000 --roles manager=1,factory=4
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+from array import array
+
+from address import Address, AddressBook
+from employees import EmployeeDatabase, EmployeeRows
+from payroll_system import (
+    CommissionPolicy,
+    HourlyPolicy,
+    PayrollSystem,
+    SalaryPolicy,
+)
+
+ROLES = ["manager", "secretary", "sales", "factory"]
+POLICIES = {
+    "salary": lambda i: SalaryPolicy(1000 + i % 2000),
+    "hourly": lambda i: HourlyPolicy(9 + i % 30),
+    "commission": lambda i: CommissionPolicy(1000 + i % 500, 100 + i % 70),
+}
+STATES = [
+    ("Concord", "NH", "03301"),
+    ("Manchester", "NH", "03101"),
+    ("Keene", "NH", "03431"),
+]
+
+
+def parse_mix(text, choices):
+    """
+    "manager=1,factory=2" -> ["manager", "factory", "factory"]
+    """
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in choices:
+            raise argparse.ArgumentTypeError(f"unknown choice {name!r}")
+        count = int(weight or 1)
+        if count < 1:
+            raise argparse.ArgumentTypeError(f"weight of {name!r} must be at least 1")
+        mix.extend([name] * count)
+    return mix
+
+
+def synthetic_policies(size, kinds=tuple(POLICIES), distinct=None, hours=None):
+    """
+    size policies of the given kinds in turn, built with the POLICIES
+    formulas. distinct=n repeats the parameters of the first n policies,
+    hours(i) is tracked on policy i when given.
+    """
+    policies = []
+    for i in range(size):
+        seed = i if distinct is None else i % distinct
+        policy = POLICIES[kinds[i % len(kinds)]](seed)
+        if hours is not None:
+            policy.track_work(hours(i))
+        policies.append(policy)
+    return policies
+
+
+def generate(size, roles, policies):
+    rows = EmployeeRows(
+        {"id": i, "name": f"Employee {i}", "role": roles[i % len(roles)]}
+        for i in range(size)
+    )
+    employee_policies = dict(enumerate(synthetic_policies(size, policies)))
+    addresses = {}
+    for i in range(size):
+        city, state, zipcode = STATES[i % len(STATES)]
+        addresses[i] = Address(f"{i} Main St", city, state, zipcode)
+    return EmployeeDatabase(
+        employees=rows,
+        payroll=PayrollSystem(employee_policies),
+        employee_addresses=AddressBook(addresses),
+    )
+
+
+def timed_consumer(iterable, samples):
+    """
+    Yields from iterable and records, in nanoseconds, how long the consumer
+    took to come back for the next item.
+    """
+    clock = time.perf_counter_ns
+    for item in iterable:
+        start = clock()
+        yield item
+        samples.append(clock() - start)
+
+
+def timed_producer(iterable, samples):
+    """
+    Yields from iterable and records, in nanoseconds, how long iterable took
+    to produce each item.
+    """
+    clock = time.perf_counter_ns
+    iterator = iter(iterable)
+    while True:
+        start = clock()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        samples.append(clock() - start)
+        yield item
+
+
+def percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))
+    return sorted_samples[index] / 1000
+
+
+def run_stage(name, size, stage, trace_memory):
+    samples = array("q")
+    if trace_memory:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result = stage(samples)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+    ordered = sorted(samples)
+    return result, {
+        "stage": name,
+        "seconds": elapsed,
+        "per_second": size / elapsed if elapsed else 0.0,
+        "p50_us": percentile(ordered, 0.50),
+        "p99_us": percentile(ordered, 0.99),
+        "peak_mib": peak / 2**20,
+    }
+
+
+def run(size, roles, policies, hours=40, trace_memory=True):
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        employee_database, generate_stats = run_stage(
+            "generate",
+            size,
+            lambda samples: generate(size, roles, policies),
+            trace_memory,
+        )
+        employees, build_stats = run_stage(
+            "build employees",
+            size,
+            lambda samples: list(
+                timed_producer(employee_database.iter_employees(), samples)
+            ),
+            trace_memory,
+        )
+        with open(os.devnull, "w") as devnull:
+            _, track_stats = run_stage(
+                "track",
+                size,
+                lambda samples: employee_database.productivity.track(
+                    timed_consumer(employees, samples), hours, stream=devnull
+                ),
+                trace_memory,
+            )
+            _, payroll_stats = run_stage(
+                "calculate_payroll",
+                size,
+                lambda samples: employee_database.payroll.calculate_payroll(
+                    timed_consumer(employees, samples), stream=devnull
+                ),
+                trace_memory,
+            )
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return [generate_stats, build_stats, track_stats, payroll_stats]
+
+
+def print_report(size, stats):
+    print(f"{size} employees")
+    header = (
+        f"{'stage':<20}{'seconds':>10}{'employees/s':>14}"
+        f"{'p50 us':>9}{'p99 us':>9}{'peak MiB':>10}"
+    )
+    print(header)
+    print("-" * len(header))
+    for s in stats:
+        p50, p99 = (
+            "-" if value is None else f"{value:.2f}"
+            for value in (s["p50_us"], s["p99_us"])
+        )
+        print(
+            f"{s['stage']:<20}{s['seconds']:>10.3f}{s['per_second']:>14,.0f}"
+            f"{p50:>9}{p99:>9}{s['peak_mib']:>10.1f}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the payroll flow.")
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument(
+        "--roles",
+        type=lambda text: parse_mix(text, ROLES),
+        default=ROLES,
+        help="weighted role mix, e.g. manager=1,secretary=2,sales=2,factory=5",
+    )
+    parser.add_argument(
+        "--policies",
+        type=lambda text: parse_mix(text, POLICIES),
+        default=list(POLICIES),
+        help="weighted policy mix, e.g. salary=3,hourly=6,commission=1",
+    )
+    parser.add_argument("--hours", type=int, default=40)
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="skip tracemalloc, which slows every stage down",
+    )
+    args = parser.parse_args(argv)
+    stats = run(args.size, args.roles, args.policies, args.hours, not args.no_memory)
+    print_report(args.size, stats)
+
+
+if __name__ == "__main__":
+    main()
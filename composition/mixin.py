@@ -1,21 +1,73 @@
 import json
+import sys
+import time
 from pprint import pprint
 
 
 class JSONMixin:
     def to_json(self):
-        print(json.dumps(self.to_dict()))
+        self.dump_json(sys.stdout)
+        print()
+
+    def dump_json(self, fp, chunk_size=65536):
+        """
+        Streams the JSON of this object into a text file or a socket.
+        """
+        from json_stream import dump
+
+        dump(self, fp, chunk_size)
+
+    @classmethod
+    def from_json(cls, text, resolve_references=False):
+        """
+        Builds an instance without calling __init__, see deserializer.py.
+        """
+        from deserializer import from_json
+
+        return from_json(cls, text, resolve_references)
 
 
 class DictMixin:
     def to_dict(self):
-        return self._traverse_dict(self.__dict__)
+        """
+        Uses a serializer compiled once per class and attribute layout,
+        unless the class customizes the traversal.
+        """
+        if not _compilable(type(self)):
+            return self._traverse_dict(self.__dict__)
+        return _serialize(self)
+
+    def to_shared_dict(self, check_circular=False):
+        """
+        Like to_dict, but objects reached more than once are serialized once
+        and referenced with {"$ref": id} afterwards, see references.py.
+        """
+        from references import to_shared_dict
+
+        return to_shared_dict(self, check_circular)
+
+    @classmethod
+    def from_dict(cls, data, resolve_references=False):
+        """
+        Builds an instance without calling __init__, see deserializer.py.
+        """
+        if not resolve_references:
+            builder = _last_builders.get(cls)
+            if builder is not None:
+                try:
+                    return builder(data)
+                except KeyError:
+                    # Other keys than the last plan of cls.
+                    pass
+        from deserializer import from_dict
+
+        return from_dict(cls, data, resolve_references)
 
     def _traverse_dict(self, attributes):
         result = {}
         for key, val in attributes.items():
             result[key] = self._traverse(key, val)
-        return val
+        return result
 
     def _traverse(self, key, value):
         if isinstance(value, DictMixin):
@@ -30,6 +82,115 @@ class DictMixin:
             return value
 
 
+# Compiled serializers.
+#
+# _traverse runs an isinstance/hasattr chain for every value of every object.
+# Instead, the first time a class is serialized with a given set of attribute
+# names, a function reading exactly those attributes is generated for it, and
+# values go through a converter picked once per value type (convert). Scalars
+# (SCALARS: str, int, float, bool, None) are returned as is without a call. A
+# new attribute layout compiles a new serializer, invalidate_serializers()
+# drops the cached ones. Whether a DictMixin value uses the compiled serializer
+# or its own to_dict (uses_default_serialization) is checked on every call, so
+# replacing to_dict or _traverse later still counts.
+
+SCALARS = frozenset([str, int, float, bool, type(None)])
+_serializers = {}
+_converters = {}
+# Filled by deserializer.py, (class, keys) -> compiled from_dict builder, and
+# class -> builder of the keys it was last built from.
+_builders = {}
+_last_builders = {}
+
+
+def invalidate_serializers(cls=None):
+    for key in list(_serializers):
+        if cls is None or key[0] is cls:
+            del _serializers[key]
+    _converters.clear()
+
+
+def _compile_serializer(key):
+    cls, names = key
+    lines = ["def serialize(attributes):", "    result = {}"]
+    for name in names:
+        lines.append(f"    value = attributes[{name!r}]")
+        lines.append(
+            f"    result[{name!r}] = value if type(value) in scalars"
+            " else convert(value)"
+        )
+    lines.append("    return result")
+    namespace = {"scalars": SCALARS, "convert": convert}
+    exec(compile("\n".join(lines), f"<serializer {cls.__name__}>", "exec"), namespace)
+    serializer = _serializers[key] = namespace["serialize"]
+    return serializer
+
+
+def uses_default_serialization(cls):
+    """
+    True when instances of the DictMixin class cls are serialized through
+    their attributes, i.e. neither to_dict nor the traversal is overridden.
+    """
+    return cls.to_dict is DictMixin.to_dict and _compilable(cls)
+
+
+def _compilable(cls):
+    return (
+        cls._traverse is DictMixin._traverse
+        and cls._traverse_dict is DictMixin._traverse_dict
+    )
+
+
+def _serialize(obj):
+    attributes = obj.__dict__
+    key = (type(obj), tuple(attributes))
+    serializer = _serializers.get(key) or _compile_serializer(key)
+    return serializer(attributes)
+
+
+def convert(value):
+    """
+    to_dict conversion of a single value, the way attributes are converted.
+    """
+    converter = _converters.get(type(value))
+    if converter is None:
+        converter = _converters[type(value)] = _converter_for(value)
+    return converter(value)
+
+
+def _converter_for(value):
+    # Same order as DictMixin._traverse.
+    if isinstance(value, DictMixin):
+        return _convert_mixin
+    elif isinstance(value, dict):
+        return _convert_dict
+    elif isinstance(value, list):
+        return _convert_list
+    elif hasattr(value, "__dict__"):
+        return lambda v: _convert_dict(v.__dict__)
+    else:
+        return lambda v: v
+
+
+def _convert_mixin(value):
+    if uses_default_serialization(type(value)):
+        return _serialize(value)
+    return value.to_dict()
+
+
+def _convert_dict(attributes):
+    return {
+        key: value if type(value) in SCALARS else convert(value)
+        for key, value in attributes.items()
+    }
+
+
+def _convert_list(values):
+    return [
+        value if type(value) in SCALARS else convert(value) for value in values
+    ]
+
+
 class Person:
     def __init__(self, name):
         self.name = name
@@ -42,6 +203,39 @@ class Employee(DictMixin, JSONMixin, Person):
         self.dependents = dependents
 
 
+class _Wide(DictMixin):
+    def __init__(self, width):
+        for i in range(width):
+            setattr(self, f"field_{i}", [i, str(i)] if i % 10 == 0 else i)
+
+
+class _Node(DictMixin):
+    def __init__(self, depth):
+        self.name = f"node {depth}"
+        self.weight = depth * 1.5
+        self.children = [_Node(depth - 1), _Node(depth - 1)] if depth else []
+
+
+def _benchmark(label, objects):
+    traversed = [obj._traverse_dict(obj.__dict__) for obj in objects]
+    compiled = [obj.to_dict() for obj in objects]
+    assert traversed == compiled
+
+    start = time.perf_counter()
+    for obj in objects:
+        obj._traverse_dict(obj.__dict__)
+    traverse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for obj in objects:
+        obj.to_dict()
+    compiled_time = time.perf_counter() - start
+    print(
+        f"{label:<24}{traverse_time:>10.3f}{compiled_time:>10.3f}"
+        f"{traverse_time / compiled_time:>9.1f}x"
+    )
+
+
 if __name__ == "__main__":
     e = Employee(
         name="Ayush",
@@ -51,3 +245,8 @@ if __name__ == "__main__":
 
     pprint(e.to_dict())
     e.to_json()
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    print(f"\n{'objects':<24}{'traverse':>10}{'compiled':>10}{'speedup':>10}")
+    _benchmark(f"{size} x 100 attributes", [_Wide(100) for _ in range(size)])
+    _benchmark(f"{size // 100} trees, depth 8", [_Node(8) for _ in range(size // 100)])
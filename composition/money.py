@@ -0,0 +1,76 @@
+"""
+Money as integer cents.
+
+Floats can't represent most cent amounts and lose precision when millions of
+them are summed, so exact payroll arithmetic is done on int cents:
+
+- Amounts given as floats are read through their shortest decimal repr, so
+  9.99 is 999 cents and not 998.99999...
+- A computed amount that falls between two cents is rounded once, half to
+  even (banker's rounding), and only at the end of the computation.
+- Sums of cents are exact integers. sum_cents adds up an array of cents with
+  NumPy's int64 sum when NumPy is available.
+"""
+
+from array import array
+from decimal import Decimal
+from fractions import Fraction
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def exact(amount):
+    """
+    Exact rational value of an int, float, Decimal or Fraction amount.
+    """
+    if isinstance(amount, float):
+        return Fraction(Decimal(repr(amount)))
+    return Fraction(amount)
+
+
+def round_half_even(value):
+    quotient, remainder = divmod(value.numerator, value.denominator)
+    twice = 2 * remainder
+    if twice > value.denominator or (
+        twice == value.denominator and quotient % 2 == 1
+    ):
+        quotient += 1
+    return quotient
+
+
+def to_cents(amount):
+    return round_half_even(exact(amount) * 100)
+
+
+def format_cents(cents):
+    sign = "-" if cents < 0 else ""
+    dollars, cents = divmod(abs(cents), 100)
+    return f"{sign}{dollars}.{cents:02d}"
+
+
+def scale_cents(cents, factor):
+    """
+    cents * factor rounded half to even, factor is any exact() amount.
+    """
+    factor = exact(factor)
+    if factor.denominator == 1:
+        return cents * factor.numerator
+    return round_half_even(cents * factor)
+
+
+def cents_array(values):
+    if np is not None:
+        return np.fromiter(values, dtype=np.int64)
+    return array("q", values)
+
+
+def sum_cents(cents):
+    """
+    Exact total of an iterable or array of cents.
+    """
+    if np is not None and isinstance(cents, np.ndarray):
+        return int(cents.sum(dtype=np.int64))
+    return sum(cents)
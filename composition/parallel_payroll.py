@@ -0,0 +1,229 @@
+"""
+Multi-core payroll runs.
+
+The policy columns (type code, weekly salary, hourly rate, commission per sale
+and hours worked) are copied once into multiprocessing.shared_memory blocks.
+The roster is split into contiguous shards and each worker process attaches to
+the blocks by name, computes the check amounts of its shard and writes them
+into a shared output column, so no Employee or PayrollPolicy is ever pickled.
+
+The columns are int64, so a policy goes to the workers only if it is one of
+the three policy classes and all its values are small ints (fits_int64, the
+rule of the batch mode). Workers compute with Python ints like the policy
+methods do, commission amounts are written to a float64 output column. Every
+other policy (float rates, large ints, subclasses) is computed in the parent.
+
+Shards are merged in shard order and the run total is an exactly rounded sum
+(math.fsum) of the amounts, so a parallel run returns the same amounts, of
+the same types, and total as calculate_serial.
+"""
+
+import math
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from payroll_system import (
+    COMMISSION,
+    HOURLY,
+    OTHER,
+    POLICY_TYPE_CODES,
+    SALARY,
+    CommissionPolicy,
+    HourlyPolicy,
+    SalaryPolicy,
+    fits_int64,
+)
+
+_COLUMNS = {
+    "type_code": "b",
+    "weekly_salary": "q",
+    "hourly_rate": "q",
+    "commission_per_sale": "q",
+    "hours_worked": "q",
+    "amount": "q",
+    "commission_amount": "d",
+}
+_INPUTS = ("weekly_salary", "hourly_rate", "commission_per_sale", "hours_worked")
+
+
+class SharedPayrollTable:
+    def __init__(self, policies):
+        policies = list(policies)
+        self.size = len(policies)
+        self._other = []
+        columns = {name: array(typecode) for name, typecode in _COLUMNS.items()}
+        for index, policy in enumerate(policies):
+            code = POLICY_TYPE_CODES.get(type(policy), OTHER)
+            inputs = [getattr(policy, name, 0) for name in _INPUTS]
+            if code == OTHER or not all(map(fits_int64, inputs)):
+                # Computed in the parent, the workers only see zeros.
+                self._other.append((index, policy))
+                code = OTHER
+                inputs = [0] * len(_INPUTS)
+            columns["type_code"].append(code)
+            for name, value in zip(_INPUTS, inputs):
+                columns[name].append(value)
+        for name in ("amount", "commission_amount"):
+            columns[name].extend([0] * self.size)
+
+        self._blocks = {}
+        for name, values in columns.items():
+            # SharedMemory refuses empty blocks.
+            block = shared_memory.SharedMemory(
+                create=True, size=max(len(values) * values.itemsize, 1)
+            )
+            block.buf[: len(values) * values.itemsize] = values.tobytes()
+            self._blocks[name] = block
+
+    def block_names(self):
+        return {name: block.name for name, block in self._blocks.items()}
+
+    def amounts(self):
+        views = [
+            _column(self._blocks[name], _COLUMNS[name], self.size)
+            for name in ("type_code", "amount", "commission_amount")
+        ]
+        amounts = [
+            commission_amount if code == COMMISSION else amount
+            for code, amount, commission_amount in zip(*views)
+        ]
+        for view in views:
+            view.release()
+        for index, policy in self._other:
+            amounts[index] = policy.calculate_payroll()
+        return amounts
+
+    def close(self):
+        for block in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _column(block, typecode, size):
+    # Blocks can be larger than requested (rounded up to a page size).
+    return block.buf[: size * array(typecode).itemsize].cast(typecode)
+
+
+def _calculate_shard(block_names, size, start, stop):
+    blocks = {
+        name: shared_memory.SharedMemory(name=shared)
+        for name, shared in block_names.items()
+    }
+    try:
+        columns = {
+            name: _column(blocks[name], typecode, size)
+            for name, typecode in _COLUMNS.items()
+        }
+        type_code = columns["type_code"]
+        weekly_salary = columns["weekly_salary"]
+        hourly_rate = columns["hourly_rate"]
+        commission_per_sale = columns["commission_per_sale"]
+        hours_worked = columns["hours_worked"]
+        amount = columns["amount"]
+        commission_amount = columns["commission_amount"]
+        amounts = []
+        for i in range(start, stop):
+            code = type_code[i]
+            if code == SALARY:
+                amount[i] = value = weekly_salary[i]
+            elif code == HOURLY:
+                amount[i] = value = hours_worked[i] * hourly_rate[i]
+            elif code == COMMISSION:
+                commission_amount[i] = value = (
+                    weekly_salary[i] + hours_worked[i] / 5 * commission_per_sale[i]
+                )
+            else:
+                continue
+            amounts.append(value)
+        total = math.fsum(amounts)
+        for view in columns.values():
+            view.release()
+        return total
+    finally:
+        for block in blocks.values():
+            block.close()
+
+
+def shard_bounds(size, shards):
+    step, extra = divmod(size, shards)
+    start = 0
+    for shard in range(shards):
+        stop = start + step + (1 if shard < extra else 0)
+        yield start, stop
+        start = stop
+
+
+def calculate_parallel(policies, workers=4, shards=None):
+    """
+    Returns (amounts, total, shard_totals). shard_totals only covers the
+    policies computed by the workers, subclasses are computed in the parent.
+    """
+    with SharedPayrollTable(policies) as table:
+        names = table.block_names()
+        bounds = list(shard_bounds(table.size, shards or workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_calculate_shard, names, table.size, start, stop)
+                for start, stop in bounds
+            ]
+            # Merge in shard order, not in completion order.
+            shard_totals = [future.result() for future in futures]
+        amounts = table.amounts()
+    return amounts, math.fsum(amounts), shard_totals
+
+
+def calculate_serial(policies):
+    amounts = [policy.calculate_payroll() for policy in policies]
+    return amounts, math.fsum(amounts)
+
+
+if __name__ == "__main__":
+    from employees import EmployeeDatabase
+    from load_test import synthetic_policies
+    from payroll_system import PayrollSystem
+
+    # Floats and ints too large for the columns are computed in the parent.
+    mixed = [SalaryPolicy(2**53 + 1), HourlyPolicy(12.5), CommissionPolicy(1000.5, 7)]
+    mixed += synthetic_policies(30, hours=lambda i: i % 60)
+    for policy in mixed:
+        policy.track_work(40)
+    expected = [repr(amount) for amount in calculate_serial(mixed)[0]]
+    assert [repr(amount) for amount in calculate_parallel(mixed, 2)[0]] == expected
+
+    employees = EmployeeDatabase().employees
+    for employee in employees:
+        employee.track_work(40)
+    amounts = PayrollSystem().check_amounts(employees, workers=2)
+    assert amounts == [employee.calculate_payroll() for employee in employees]
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    policies = synthetic_policies(size, hours=lambda i: i % 60)
+
+    start = time.perf_counter()
+    serial_amounts, serial_total = calculate_serial(policies)
+    serial_time = time.perf_counter() - start
+    print(f"{size} policies, serial: {serial_time:.3f}s")
+
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8} {'exact':>6}")
+    for workers in (1, 2, 4, 8):
+        start = time.perf_counter()
+        amounts, total, _ = calculate_parallel(policies, workers)
+        elapsed = time.perf_counter() - start
+        exact = (
+            amounts == serial_amounts
+            and list(map(type, amounts)) == list(map(type, serial_amounts))
+            and total == serial_total
+        )
+        print(
+            f"{workers:>8} {elapsed:>9.3f} {serial_time / elapsed:>8.2f} {exact!s:>6}"
+        )
@@ -0,0 +1,118 @@
+"""
+Opt-in memoization of payroll results.
+
+PayrollResultCache is a bounded LRU of results keyed by the policy type, its
+parameters and hours worked, and the types of these values (HourlyPolicy(15)
+pays 600, HourlyPolicy(15.0) pays 600.0), so employees with identical
+policies share one entry. CachedPolicy wraps a policy and answers
+calculate_payroll() and commission from the shared cache. The key is built
+from the current values on every call, so track_work or a changed parameter
+never reads a stale entry.
+"""
+
+from collections import OrderedDict
+
+_PARAMETERS = ("weekly_salary", "hourly_rate", "commission_per_sale", "hours_worked")
+
+
+class PayrollResultCache:
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key(policy, name):
+        attributes = getattr(policy, "__dict__", None)
+        if attributes is None:
+            # Slotted policies such as PolicyStore views.
+            values = [getattr(policy, p, None) for p in _PARAMETERS]
+        else:
+            values = [
+                value
+                for attribute, value in attributes.items()
+                if not attribute.startswith("_")
+            ]
+        parameters = tuple((type(value), value) for value in values)
+        return (type(policy), name, parameters)
+
+    def lookup(self, policy, name, compute):
+        key = self.key(policy, name)
+        entries = self._entries
+        if key in entries:
+            self.hits += 1
+            entries.move_to_end(key)
+            return entries[key]
+        self.misses += 1
+        result = entries[key] = compute()
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return result
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CachedPolicy:
+    def __init__(self, policy, cache):
+        self.policy = policy
+        self.cache = cache
+
+    def calculate_payroll(self):
+        return self.cache.lookup(
+            self.policy, "calculate_payroll", self.policy.calculate_payroll
+        )
+
+    @property
+    def commission(self):
+        policy = self.policy
+        return self.cache.lookup(policy, "commission", lambda: policy.commission)
+
+    def track_work(self, hours):
+        self.policy.track_work(hours)
+
+    def __getattr__(self, name):
+        # Everything else (hours_worked, weekly_salary, add_observer...)
+        # belongs to the wrapped policy.
+        return getattr(self.policy, name)
+
+
+if __name__ == "__main__":
+    from load_test import synthetic_policies
+    from payroll_system import HourlyPolicy, SalaryPolicy
+
+    cache = PayrollResultCache(maxsize=256)
+    # Three distinct policies, each shared by 10 000 employees.
+    policies = [
+        CachedPolicy(policy, cache)
+        for policy in synthetic_policies(30_000, distinct=3)
+    ]
+    for policy in policies:
+        policy.track_work(40)
+    for _ in range(3):  # e.g. report, audit and check run
+        total = sum(policy.calculate_payroll() for policy in policies)
+    policies[0].track_work(1)
+    print(f"Total: {total}, after a correction: {policies[0].calculate_payroll()}")
+    print(cache.stats())
+
+    salaried = CachedPolicy(SalaryPolicy(3000), cache)
+    salaried.calculate_payroll()
+    salaried.policy.weekly_salary = 5000
+    assert salaried.calculate_payroll() == 5000
+    hourly = [CachedPolicy(HourlyPolicy(rate), cache) for rate in (15, 15.0)]
+    for policy in hourly:
+        policy.track_work(40)
+    assert [repr(policy.calculate_payroll()) for policy in hourly] == ["600", "600.0"]
@@ -0,0 +1,289 @@
+"""
+Struct-of-arrays storage for payroll policies.
+
+Instead of one object with a __dict__ per employee, PolicyStore keeps the
+type code, weekly salary, hourly rate, commission per sale and hours worked
+of every policy in typed arrays, one row per employee. PolicyView is a small
+__slots__ object that points at a row and offers the usual calculate_payroll()
+and track_work() interface, views are created on demand and never stored.
+
+The numeric columns are int64, so ints come back as the same ints and check
+amounts are the ones the policy classes compute. A float is kept in a float64
+column of the same name instead, and the row's kinds byte has the column's
+bit set, like the kinds columns of snapshot.py. Float columns only grow up to
+the last row holding a float, a roster of ints pays one byte per row.
+"""
+
+import sys
+import tracemalloc
+from array import array
+from itertools import repeat
+
+from money import exact, round_half_even, scale_cents, to_cents
+from payroll_system import (
+    COMMISSION,
+    HOURLY,
+    POLICY_TYPE_CODES,
+    SALARY,
+    CommissionPolicy,
+    HourlyPolicy,
+    SalaryPolicy,
+)
+
+NUMERIC_COLUMNS = (
+    "weekly_salary",
+    "hourly_rate",
+    "commission_per_sale",
+    "hours_worked",
+)
+# Bit of each numeric column in the kinds byte of a row, set for a float.
+_FLOAT_BITS = {name: 1 << bit for bit, name in enumerate(NUMERIC_COLUMNS)}
+
+
+class PolicyView:
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    @property
+    def type_code(self):
+        return self._store.type_code[self._row]
+
+    @property
+    def weekly_salary(self):
+        return self._store.value("weekly_salary", self._row)
+
+    @property
+    def hourly_rate(self):
+        return self._store.value("hourly_rate", self._row)
+
+    @property
+    def commission_per_sale(self):
+        return self._store.value("commission_per_sale", self._row)
+
+    @property
+    def hours_worked(self):
+        return self._store.value("hours_worked", self._row)
+
+    @property
+    def commission(self):
+        return self.hours_worked / 5 * self.commission_per_sale
+
+    @property
+    def commission_cents(self):
+        return self._store.commission_cents(self._row)
+
+    def track_work(self, hours):
+        self._store.track_work(self._row, hours)
+
+    def calculate_payroll(self):
+        return self._store.calculate_payroll(self._row)
+
+    def calculate_payroll_for(self, hours):
+        return self._store.calculate_payroll_for(self._row, hours)
+
+    def calculate_payroll_cents(self):
+        return self._store.calculate_payroll_cents(self._row)
+
+    def add_observer(self, observer):
+        self._store._observers.setdefault(self._row, []).append(observer)
+
+    def remove_observer(self, observer):
+        self._store._observers[self._row].remove(observer)
+
+    def __eq__(self, other):
+        if not isinstance(other, PolicyView):
+            return NotImplemented
+        return self._store is other._store and self._row == other._row
+
+    def __hash__(self):
+        return hash((id(self._store), self._row))
+
+
+class PolicyStore:
+    def __init__(self):
+        self.type_code = array("b")
+        self.kinds = array("b")
+        self.ints = {name: array("q") for name in NUMERIC_COLUMNS}
+        self.floats = {name: array("d") for name in NUMERIC_COLUMNS}
+        self._rows = {}
+        # Observers are rare, keep them in a sparse row -> list mapping.
+        self._observers = {}
+
+    @classmethod
+    def from_policies(cls, employee_policies):
+        store = cls()
+        for employee_id, policy in employee_policies.items():
+            store.add_policy(employee_id, policy)
+        return store
+
+    def add_policy(self, employee_id, policy):
+        code = POLICY_TYPE_CODES.get(type(policy))
+        if code is None:
+            raise ValueError(f"Unsupported policy type: {type(policy).__name__}")
+        return self._append(
+            employee_id,
+            code,
+            getattr(policy, "weekly_salary", 0),
+            getattr(policy, "hourly_rate", 0),
+            getattr(policy, "commission_per_sale", 0),
+            policy.hours_worked,
+        )
+
+    def add_salary(self, employee_id, weekly_salary):
+        return self._append(employee_id, SALARY, weekly_salary, 0, 0, 0)
+
+    def add_hourly(self, employee_id, hourly_rate):
+        return self._append(employee_id, HOURLY, 0, hourly_rate, 0, 0)
+
+    def add_commission(self, employee_id, weekly_salary, commission_per_sale):
+        return self._append(
+            employee_id, COMMISSION, weekly_salary, 0, commission_per_sale, 0
+        )
+
+    def _append(
+        self,
+        employee_id,
+        code,
+        weekly_salary,
+        hourly_rate,
+        commission_per_sale,
+        hours_worked,
+    ):
+        if employee_id in self._rows:
+            raise ValueError(f"Duplicate employee id: {employee_id}")
+        row = len(self.type_code)
+        self.type_code.append(code)
+        self.kinds.append(0)
+        for column in self.ints.values():
+            column.append(0)
+        self.set_value("weekly_salary", row, weekly_salary)
+        self.set_value("hourly_rate", row, hourly_rate)
+        self.set_value("commission_per_sale", row, commission_per_sale)
+        self.set_value("hours_worked", row, hours_worked)
+        self._rows[employee_id] = row
+        return PolicyView(self, row)
+
+    def value(self, name, row):
+        if self.kinds[row] & _FLOAT_BITS[name]:
+            return self.floats[name][row]
+        return self.ints[name][row]
+
+    def set_value(self, name, row, value):
+        bit = _FLOAT_BITS[name]
+        if isinstance(value, float):
+            floats = self.floats[name]
+            if len(floats) <= row:
+                floats.extend(repeat(0.0, row + 1 - len(floats)))
+            floats[row] = value
+            self.kinds[row] |= bit
+        else:
+            # OverflowError for ints outside int64, like an array would.
+            self.ints[name][row] = value
+            self.kinds[row] &= ~bit
+
+    def track_work(self, row, hours):
+        self.set_value("hours_worked", row, self.value("hours_worked", row) + hours)
+        observers = self._observers.get(row)
+        if observers:
+            view = PolicyView(self, row)
+            for observer in observers:
+                observer(view, hours)
+
+    def calculate_payroll(self, row):
+        return self.calculate_payroll_for(row, self.value("hours_worked", row))
+
+    def calculate_payroll_for(self, row, hours):
+        """
+        Check amount of row for the given hours instead of its hours worked.
+        """
+        value = self.value
+        code = self.type_code[row]
+        if code == SALARY:
+            return value("weekly_salary", row)
+        if code == HOURLY:
+            return hours * value("hourly_rate", row)
+        return (
+            value("weekly_salary", row)
+            + hours / 5 * value("commission_per_sale", row)
+        )
+
+    def commission_cents(self, row):
+        sales = exact(self.value("hours_worked", row)) / 5
+        return round_half_even(sales * to_cents(self.value("commission_per_sale", row)))
+
+    def calculate_payroll_cents(self, row):
+        """
+        Same cents as calculate_payroll_cents of the policy classes.
+        """
+        value = self.value
+        code = self.type_code[row]
+        if code == SALARY:
+            return to_cents(value("weekly_salary", row))
+        if code == HOURLY:
+            return scale_cents(
+                to_cents(value("hourly_rate", row)), value("hours_worked", row)
+            )
+        return to_cents(value("weekly_salary", row)) + self.commission_cents(row)
+
+    # Mapping interface so a store can back a PayrollSystem.
+    def get(self, employee_id, default=None):
+        row = self._rows.get(employee_id)
+        if row is None:
+            return default
+        return PolicyView(self, row)
+
+    def __getitem__(self, employee_id):
+        return PolicyView(self, self._rows[employee_id])
+
+    def __contains__(self, employee_id):
+        return employee_id in self._rows
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def items(self):
+        for employee_id, row in self._rows.items():
+            yield employee_id, PolicyView(self, row)
+
+
+def _measure(build):
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+if __name__ == "__main__":
+    from itertools import chain
+
+    from load_test import synthetic_policies
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    objects, object_bytes = _measure(lambda: dict(enumerate(synthetic_policies(size))))
+    store, store_bytes = _measure(lambda: PolicyStore.from_policies(objects))
+    objects[size] = SalaryPolicy(2**53 + 1)
+    objects[size + 1] = HourlyPolicy(12.5)
+    objects[size + 2] = CommissionPolicy(1000, 7.5)
+    for employee_id in range(size, size + 3):
+        store.add_policy(employee_id, objects[employee_id])
+        store[employee_id].track_work(40)
+        objects[employee_id].track_work(40)
+    # Same amounts of the same types (3000, not 3000.0).
+    assert all(
+        repr(store[i].calculate_payroll()) == repr(objects[i].calculate_payroll())
+        and store[i].calculate_payroll_cents() == objects[i].calculate_payroll_cents()
+        for i in chain(range(0, size, 997), range(size, size + 3))
+    )
+
+    print(f"{size} policies")
+    print(f"{'layout':>12} {'MiB':>9} {'bytes/policy':>13}")
+    for layout, used in (("objects", object_bytes), ("PolicyStore", store_bytes)):
+        print(f"{layout:>12} {used / 2**20:>9.1f} {used / size:>13.1f}")
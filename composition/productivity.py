@@ -1,21 +1,83 @@
+from collections import OrderedDict
+
+from report import productivity_records, productivity_text_sink, write_report
+
+
+class DutyCache:
+    """
+    Bounded LRU cache of rendered duty strings. There are only a few distinct
+    (role, hours) pairs, so a large workforce shares a handful of strings.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def render(self, template, hours):
+        # 40, 40.0 and True are equal keys but render differently.
+        key = (template, type(hours), hours)
+        duties = self._entries.get(key)
+        if duties is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return duties
+        self.misses += 1
+        duties = template.format(hours=hours)
+        self._entries[key] = duties
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return duties
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+duty_cache = DutyCache()
+
+
 class ManagerRole:
+    duties = "screams and yells for {hours} hours."
+
     def perform_duties(self, hours):
-        return f"screams and yells for {hours} hours."
+        return duty_cache.render(self.duties, hours)
 
 
 class SecretaryRole:
+    duties = "does paperwork for {hours} hours."
+
     def perform_duties(self, hours):
-        return f"does paperwork for {hours} hours."
+        return duty_cache.render(self.duties, hours)
 
 
 class SalesRole:
+    duties = "expends {hours} hours on the phone."
+
     def perform_duties(self, hours):
-        return f"expends {hours} hours on the phone."
+        return duty_cache.render(self.duties, hours)
 
 
 class FactoryRole:
+    duties = "manufactures gadgets for {hours} hours."
+
     def perform_duties(self, hours):
-        return f"manufactures gadgets for {hours} hours."
+        return duty_cache.render(self.duties, hours)
+
+
+# Roles are stateless, every employee with the same role shares one instance.
+_role_flyweights = {}
 
 
 class ProductivitySystem:
@@ -31,11 +93,22 @@ class ProductivitySystem:
         role_type = self._roles.get(role_id)
         if not role_type:
             raise ValueError(role_id)
-        return role_type()
-
-    def track(self, employees, hours):
-        print("Tracking Employee Productivity")
-        print("==============================")
-        for employee in employees:
-            employee.work(hours)
-        print("")
+        role = _role_flyweights.get(role_type)
+        if role is None:
+            role = _role_flyweights[role_type] = role_type()
+        return role
+
+    def time_clock(self, employees, maxsize=10_000, batch_size=500):
+        """
+        asyncio alternative to track for streams of per-employee punches.
+        """
+        from timeclock import TimeClock
+
+        return TimeClock(employees, maxsize, batch_size)
+
+    def track(self, employees, hours, sink=None, stream=None):
+        write_report(
+            productivity_records(employees, hours),
+            sink or productivity_text_sink(),
+            stream,
+        )
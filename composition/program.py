@@ -1,10 +1,10 @@
-from payroll_system import PayrollSystem
-from productivity import ProductivitySystem
 from employees import EmployeeDatabase
 
-productivity_system = ProductivitySystem()
-payroll_system = PayrollSystem()
 employee_database = EmployeeDatabase()
+# The database already owns the productivity and payroll systems its
+# employees were built with.
+productivity_system = employee_database.productivity
+payroll_system = employee_database.payroll
 
 employees = employee_database.employees
 productivity_system.track(employees, 40)
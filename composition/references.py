@@ -0,0 +1,177 @@
+"""
+Shared-reference aware serialization for DictMixin graphs.
+
+to_dict serializes an object again every time it is reachable, so an Address
+shared by many employees is copied into each of them, a DAG whose nodes are
+reached through several paths grows exponentially and a cycle never ends.
+
+to_shared_dict first counts how often every object is reached, walking each
+object only once. It then serializes every object once: an object reached
+more than once gets an "$id" key the first time and is written as
+{"$ref": id} afterwards. Objects reached once are written exactly like
+to_dict writes them, so a graph without sharing gives the same dict.
+
+Cycles are written as references too. With check_circular=True a reference
+back to an object that is still being serialized raises ValueError instead.
+Plain dicts and lists have nowhere to put an "$id", a dict or list that
+contains itself always raises ValueError.
+"""
+
+import json
+import sys
+import time
+
+from mixin import SCALARS, DictMixin, uses_default_serialization
+
+ID = "$id"
+REF = "$ref"
+
+
+def _is_object(value):
+    # Same order of checks as DictMixin._traverse.
+    return isinstance(value, DictMixin) or (
+        not isinstance(value, (dict, list)) and hasattr(value, "__dict__")
+    )
+
+
+def _fields(obj):
+    if isinstance(obj, DictMixin):
+        if not uses_default_serialization(type(obj)):
+            # Custom serialization, its result is taken as is.
+            return obj.to_dict()
+    return obj.__dict__
+
+
+def _children(value):
+    if isinstance(value, dict):
+        return value.values()
+    if isinstance(value, list):
+        return value
+    return _fields(value).values()
+
+
+def count_references(root):
+    """
+    Returns {id(obj): times reached} for every object and container of the
+    graph. Every one of them is walked once, whatever the number of paths.
+    """
+    counts = {}
+    stack = [root]
+    while stack:
+        value = stack.pop()
+        if type(value) in SCALARS:
+            continue
+        if not isinstance(value, (dict, list)) and not _is_object(value):
+            continue
+        key = id(value)
+        if key in counts:
+            counts[key] += 1
+            continue
+        counts[key] = 1
+        stack.extend(_children(value))
+    return counts
+
+
+class SharedSerializer:
+    def __init__(self, root, check_circular=False):
+        self._counts = count_references(root)
+        self._check_circular = check_circular
+        self._ids = {}
+        self._active = set()
+        # Keeps every serialized object alive, so no id() is reused.
+        self._seen = []
+
+    def serialize(self, value):
+        if type(value) in SCALARS:
+            return value
+        if isinstance(value, (dict, list)) and not isinstance(value, DictMixin):
+            return self._container(value)
+        if not _is_object(value):
+            return value
+        return self._object(value)
+
+    def _object(self, obj):
+        key = id(obj)
+        reference = self._ids.get(key)
+        if reference is not None:
+            if self._check_circular and key in self._active:
+                raise ValueError("Circular reference detected")
+            return {REF: reference}
+        result = {}
+        if self._counts.get(key, 1) > 1:
+            reference = self._ids[key] = len(self._ids) + 1
+            result[ID] = reference
+        self._seen.append(obj)
+        self._active.add(key)
+        try:
+            for name, value in _fields(obj).items():
+                result[name] = self.serialize(value)
+        finally:
+            self._active.discard(key)
+        return result
+
+    def _container(self, container):
+        key = id(container)
+        if key in self._active:
+            raise ValueError("Circular reference detected")
+        self._active.add(key)
+        try:
+            if isinstance(container, dict):
+                return {
+                    name: self.serialize(value) for name, value in container.items()
+                }
+            return [self.serialize(value) for value in container]
+        finally:
+            self._active.discard(key)
+
+
+def to_shared_dict(obj, check_circular=False):
+    return SharedSerializer(obj, check_circular).serialize(obj)
+
+
+class _Node(DictMixin):
+    def __init__(self, depth, child=None):
+        self.name = f"node {depth}"
+        self.left = child
+        self.right = child
+
+
+def diamond_chain(depth):
+    """
+    Every node points twice to the next one: depth + 1 objects, 2 ** depth
+    paths to the last one.
+    """
+    node = _Node(0)
+    for level in range(1, depth + 1):
+        node = _Node(level, node)
+    return node
+
+
+if __name__ == "__main__":
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    print(f"{'depth':>6}{'to_dict s':>12}{'chars':>12}{'shared s':>12}{'chars':>12}")
+    for level in range(4, depth + 1, 4):
+        root = diamond_chain(level)
+        start = time.perf_counter()
+        plain = json.dumps(root.to_dict())
+        plain_time = time.perf_counter() - start
+        start = time.perf_counter()
+        shared = json.dumps(to_shared_dict(root))
+        shared_time = time.perf_counter() - start
+        print(
+            f"{level:>6}{plain_time:>12.4f}{len(plain):>12}"
+            f"{shared_time:>12.4f}{len(shared):>12}"
+        )
+
+    root = diamond_chain(300)
+    start = time.perf_counter()
+    to_shared_dict(root)
+    print(f"\ndepth 300, shared: {time.perf_counter() - start:.4f}s")
+
+    loop = _Node(1)
+    loop.left = loop
+    print("\ncycle:", json.dumps(to_shared_dict(loop)))
+    try:
+        to_shared_dict(loop, check_circular=True)
+    except ValueError as error:
+        print("check_circular=True:", error)
@@ -0,0 +1,179 @@
+"""
+Streaming payroll and productivity reports.
+
+Records are produced one employee at a time by generators and handed to a
+sink, which renders them as text, CSV or JSON Lines. The rendered lines are
+collected in a buffer and written to the output in large chunks, so a report
+costs a handful of writes and its memory use does not depend on the number of
+employees.
+"""
+
+import csv
+import io
+import json
+import sys
+
+DEFAULT_BUFFER_SIZE = 1 << 16
+
+
+def payroll_records(employees, amounts=None, evaluate=None):
+    """
+    amounts, if given, are the precomputed check amounts of employees
+    (e.g. from the batch mode of PayrollSystem), in the same order.
+    evaluate, if given, computes the check amount of an employee in place of
+    employee.calculate_payroll().
+    """
+    if amounts is None and evaluate is not None:
+        for employee in employees:
+            yield _payroll_record(employee, evaluate(employee))
+    elif amounts is None:
+        for employee in employees:
+            yield _payroll_record(employee, employee.calculate_payroll())
+    else:
+        for employee, amount in zip(employees, amounts):
+            yield _payroll_record(employee, amount)
+
+
+def _payroll_record(employee, amount):
+    return {
+        "id": employee.id,
+        "name": employee.name,
+        "check_amount": amount,
+        "address": employee.address,
+    }
+
+
+def productivity_records(employees, hours):
+    for employee in employees:
+        yield {
+            "id": employee.id,
+            "name": employee.name,
+            "duties": employee.track_work(hours),
+        }
+
+
+class BufferedWriter:
+    def __init__(self, stream, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self._chunks = []
+        self._size = 0
+
+    def write(self, text):
+        self._chunks.append(text)
+        self._size += len(text)
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._chunks:
+            self.stream.write("".join(self._chunks))
+            self._chunks = []
+            self._size = 0
+
+
+class TextSink:
+    def __init__(self, title, render, footer=""):
+        self.title = title
+        self._render = render
+        self._footer = footer
+
+    def header(self):
+        return f"{self.title}\n{'=' * len(self.title)}\n"
+
+    def render(self, record):
+        return self._render(record)
+
+    def footer(self):
+        return self._footer
+
+
+def _render_payroll_text(record):
+    text = (
+        f"Payroll for: {record['id']} - {record['name']}\n"
+        f"- Check amount: {record['check_amount']}\n"
+    )
+    if record["address"]:
+        text += f"- Sent to:\n{record['address']}\n"
+    return text + "\n"
+
+
+def _render_productivity_text(record):
+    return f"Employee {record['id']} - {record['name']}:\n- {record['duties']}\n\n"
+
+
+def payroll_text_sink():
+    return TextSink("Calculating Payroll", _render_payroll_text)
+
+
+def productivity_text_sink():
+    return TextSink(
+        "Tracking Employee Productivity", _render_productivity_text, footer="\n"
+    )
+
+
+class CSVSink:
+    def __init__(self, fields):
+        self.fields = fields
+        self._line = io.StringIO()
+        self._writer = csv.writer(self._line)
+
+    def header(self):
+        return self._row(self.fields)
+
+    def render(self, record):
+        return self._row([_plain(record[field]) for field in self.fields])
+
+    def footer(self):
+        return ""
+
+    def _row(self, values):
+        self._line.seek(0)
+        self._line.truncate()
+        self._writer.writerow(values)
+        return self._line.getvalue()
+
+
+class JSONLinesSink:
+    def header(self):
+        return ""
+
+    def render(self, record):
+        return json.dumps({k: _plain(v) for k, v in record.items()}) + "\n"
+
+    def footer(self):
+        return ""
+
+
+def _plain(value):
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+
+def write_report(records, sink, stream=None, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Renders records through sink into stream (stdout by default) and
+    returns the number of records written.
+    """
+    writer = BufferedWriter(stream or sys.stdout, buffer_size)
+    writer.write(sink.header())
+    count = 0
+    for record in records:
+        writer.write(sink.render(record))
+        count += 1
+    writer.write(sink.footer())
+    writer.flush()
+    return count
+
+
+if __name__ == "__main__":
+    from employees import EmployeeDatabase
+
+    employee_database = EmployeeDatabase()
+    employees = employee_database.employees
+    write_report(productivity_records(employees, 40), JSONLinesSink())
+    write_report(
+        payroll_records(employees),
+        CSVSink(["id", "name", "check_amount", "address"]),
+    )
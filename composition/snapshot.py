@@ -0,0 +1,313 @@
+"""
+Memory-mapped binary snapshot of the roster, policies and addresses.
+
+A snapshot file is written once from an EmployeeDatabase and opened through
+mmap by every process that starts up. Opening parses a small header and
+creates memoryview columns over the mapped file, nothing is copied or built.
+Employees, policies and addresses are materialized on first access and
+kept, so a cold start costs a few milliseconds regardless of roster size.
+
+Layout, little-endian, every column aligned to 8 bytes:
+
+    header   magic b"PAYS", version (H), reserved (H), rows (Q), columns (I)
+    columns  name (32s), typecode (1s), padding (7x), offset (Q), bytes (Q)
+    data     one array per column
+
+Rows are sorted by employee id, so an id is found by binary search on the
+id column. Numeric columns are int64 when all values are integers and
+float64 when all are floats. A column with both keeps them apart, so an int
+is not read back as a float: the int64 column holds the ints, "name.floats"
+the floats and "name.kinds" a byte per row, 1 where the float applies.
+Strings are an offsets column ("name.offsets") plus a
+UTF-8 data column ("name.data").
+"""
+
+import mmap
+import struct
+import sys
+import time
+from array import array
+
+from address import Address
+from employees import EmployeeDatabase
+from payroll_system import (
+    COMMISSION,
+    HOURLY,
+    POLICY_TYPE_CODES,
+    SALARY,
+    CommissionPolicy,
+    HourlyPolicy,
+    PayrollSystem,
+    SalaryPolicy,
+)
+
+MAGIC = b"PAYS"
+VERSION = 2
+HEADER = struct.Struct("<4sHHQI")
+COLUMN = struct.Struct("<32s1s7xQQ")
+
+STRING_COLUMNS = ("name", "role", "street", "street2", "city", "state", "zipcode")
+NUMERIC_COLUMNS = (
+    "weekly_salary",
+    "hourly_rate",
+    "commission_per_sale",
+    "hours_worked",
+)
+
+
+def write_snapshot(path, employee_database):
+    payroll = employee_database.payroll
+    addresses = employee_database.employee_addresses
+    rows = sorted(employee_database._employees, key=lambda row: row["id"])
+
+    columns = {"id": array("q"), "policy_type": array("b")}
+    strings = {name: [] for name in STRING_COLUMNS}
+    numbers = {name: [] for name in NUMERIC_COLUMNS}
+    for row in rows:
+        employee_id = row["id"]
+        policy = payroll.get_policy(employee_id)
+        code = POLICY_TYPE_CODES.get(type(policy))
+        if code is None:
+            raise ValueError(f"Unsupported policy type: {type(policy).__name__}")
+        address = addresses.get_employee_address(employee_id)
+        columns["id"].append(employee_id)
+        columns["policy_type"].append(code)
+        for name in NUMERIC_COLUMNS:
+            numbers[name].append(getattr(policy, name, 0))
+        strings["name"].append(row["name"])
+        strings["role"].append(row["role"])
+        for name in STRING_COLUMNS[2:]:
+            strings[name].append(getattr(address, name))
+
+    for name, values in numbers.items():
+        columns.update(_numeric_columns(name, values))
+    for name, values in strings.items():
+        offsets = array("q", [0])
+        data = bytearray()
+        for value in values:
+            data += value.encode()
+            offsets.append(len(data))
+        columns[f"{name}.offsets"] = offsets
+        columns[f"{name}.data"] = array("B", data)
+
+    with open(path, "wb") as snapshot_file:
+        offset = _align(HEADER.size + COLUMN.size * len(columns))
+        snapshot_file.write(HEADER.pack(MAGIC, VERSION, 0, len(rows), len(columns)))
+        for name, values in columns.items():
+            size = len(values) * values.itemsize
+            snapshot_file.write(
+                COLUMN.pack(name.encode(), values.typecode.encode(), offset, size)
+            )
+            offset = _align(offset + size)
+        for values in columns.values():
+            snapshot_file.seek(_align(snapshot_file.tell()))
+            values.tofile(snapshot_file)
+
+
+def _numeric_columns(name, values):
+    kinds = array("b", [not isinstance(value, int) for value in values])
+    if not any(kinds):
+        return {name: array("q", values)}
+    if all(kinds):
+        return {name: array("d", values)}
+    return {
+        name: array("q", [0 if kind else value for kind, value in zip(kinds, values)]),
+        f"{name}.floats": array(
+            "d", [value if kind else 0.0 for kind, value in zip(kinds, values)]
+        ),
+        f"{name}.kinds": kinds,
+    }
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+class Snapshot:
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._map)
+        magic, version, _, self.rows, count = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a payroll snapshot")
+        if version != VERSION:
+            raise ValueError(f"Unsupported snapshot version: {version}")
+        self.columns = {}
+        for index in range(count):
+            name, typecode, offset, size = COLUMN.unpack_from(
+                buffer, HEADER.size + index * COLUMN.size
+            )
+            view = buffer[offset : offset + size].cast(typecode.decode())
+            self.columns[name.rstrip(b"\0").decode()] = view
+        buffer.release()
+        self._employees = {}
+        self._policies = {}
+        self._addresses = {}
+
+    def close(self):
+        for view in self.columns.values():
+            view.release()
+        self.columns = {}
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def row_of(self, employee_id):
+        ids = self.columns["id"]
+        low, high = 0, self.rows
+        while low < high:
+            middle = (low + high) // 2
+            if ids[middle] < employee_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.rows or ids[low] != employee_id:
+            raise ValueError(employee_id)
+        return low
+
+    def string(self, name, row):
+        offsets = self.columns[f"{name}.offsets"]
+        data = self.columns[f"{name}.data"]
+        return str(data[offsets[row] : offsets[row + 1]], "utf-8")
+
+    def number(self, name, row):
+        kinds = self.columns.get(f"{name}.kinds")
+        if kinds is not None and kinds[row]:
+            return self.columns[f"{name}.floats"][row]
+        return self.columns[name][row]
+
+    def employee_row(self, row):
+        return {
+            "id": self.columns["id"][row],
+            "name": self.string("name", row),
+            "role": self.string("role", row),
+        }
+
+    def policy(self, row):
+        policy = self._policies.get(row)
+        if policy is None:
+            number = self.number
+            code = self.columns["policy_type"][row]
+            if code == SALARY:
+                policy = SalaryPolicy(number("weekly_salary", row))
+            elif code == HOURLY:
+                policy = HourlyPolicy(number("hourly_rate", row))
+            elif code == COMMISSION:
+                policy = CommissionPolicy(
+                    number("weekly_salary", row), number("commission_per_sale", row)
+                )
+            else:
+                raise ValueError(f"Unknown policy type code: {code}")
+            policy.hours_worked = number("hours_worked", row)
+            self._policies[row] = policy
+        return policy
+
+    def address(self, row):
+        address = self._addresses.get(row)
+        if address is None:
+            address = self._addresses[row] = Address(
+                self.string("street", row),
+                self.string("city", row),
+                self.string("state", row),
+                self.string("zipcode", row),
+                self.string("street2", row),
+            )
+        return address
+
+    def employee_database(self):
+        return EmployeeDatabase(
+            employees=SnapshotRows(self),
+            payroll=PayrollSystem(SnapshotPolicies(self)),
+            employee_addresses=SnapshotAddressBook(self),
+        )
+
+
+class SnapshotRows:
+    """
+    Read-only employee rows with the interface of EmployeeRows.
+    """
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def __iter__(self):
+        for row in range(self._snapshot.rows):
+            yield self._snapshot.employee_row(row)
+
+    def get(self, employee_id):
+        try:
+            return self._snapshot.employee_row(self._snapshot.row_of(employee_id))
+        except ValueError:
+            return None
+
+    def append(self, row):
+        raise TypeError("Snapshot rows are read-only")
+
+    update = remove = append
+
+
+class SnapshotPolicies:
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def get(self, employee_id, default=None):
+        try:
+            return self._snapshot.policy(self._snapshot.row_of(employee_id))
+        except ValueError:
+            return default
+
+    def items(self):
+        ids = self._snapshot.columns["id"]
+        for row in range(self._snapshot.rows):
+            yield ids[row], self._snapshot.policy(row)
+
+
+class SnapshotAddressBook:
+    """
+    Lazy stand-in for AddressBook, without the secondary indexes.
+    """
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def get_employee_address(self, employee_id):
+        return self._snapshot.address(self._snapshot.row_of(employee_id))
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    from load_test import POLICIES, ROLES, generate
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    start = time.perf_counter()
+    employee_database = generate(size, ROLES, list(POLICIES))
+    rebuild = time.perf_counter() - start
+    # One float rate makes its columns mixed, the ints must stay ints.
+    employee_database.payroll.get_policy(1).hourly_rate = 12.5
+
+    path = os.path.join(tempfile.mkdtemp(), "payroll.snapshot")
+    write_snapshot(path, employee_database)
+
+    start = time.perf_counter()
+    snapshot = Snapshot(path)
+    database = snapshot.employee_database()
+    employee = database.get_employee(size // 2)
+    cold_start = time.perf_counter() - start
+
+    for employee_id in (1, size // 2, size - 1):
+        expected = employee_database.get_employee(employee_id).calculate_payroll()
+        loaded = database.get_employee(employee_id).calculate_payroll()
+        assert repr(loaded) == repr(expected), (employee_id, loaded, expected)
+    print(f"{size} employees, snapshot {os.path.getsize(path) / 2**20:.1f} MiB")
+    print(f"rebuild from scratch: {rebuild * 1000:.1f} ms")
+    print(f"snapshot cold start:  {cold_start * 1000:.3f} ms")
+    snapshot.close()
+    os.remove(path)
@@ -0,0 +1,474 @@
+"""
+SQLite storage backend for EmployeeDatabase, PayrollSystem and AddressBook.
+
+One connection is shared by the three subsystems. Reads stream rows in
+batches with fetchmany, so large tables are never fetched in one go, and
+every statement is a constant parameterized SQL string that sqlite3 compiles
+once and keeps in the connection's statement cache.
+
+Iterating the employees reads the employees, policies and addresses tables
+as three streams ordered by id and merges them, so a roster is hydrated with
+three queries and nothing is loaded up front. Single employees are looked up
+by id, and the address queries use indexes of the addresses table.
+
+Hours tracked on a stored policy are written back to the policies table in
+batches of batch_size (and by flush() and close()). Until then the storage
+keeps the changed policies, so they are not lost when their employee is
+dropped.
+"""
+
+import sqlite3
+import sys
+import time
+import tracemalloc
+import weakref
+from functools import partial
+
+from address import Address
+from payroll_system import CommissionPolicy, HourlyPolicy, SalaryPolicy
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS employees (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    role TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS policies (
+    employee_id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    weekly_salary NUMERIC,
+    hourly_rate NUMERIC,
+    commission_per_sale NUMERIC,
+    hours_worked NUMERIC NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS addresses (
+    employee_id INTEGER PRIMARY KEY,
+    street TEXT NOT NULL,
+    street2 TEXT NOT NULL DEFAULT '',
+    city TEXT NOT NULL,
+    state TEXT NOT NULL,
+    zipcode TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS addresses_state ON addresses (state);
+CREATE INDEX IF NOT EXISTS addresses_city ON addresses (city);
+CREATE INDEX IF NOT EXISTS addresses_zipcode ON addresses (zipcode, employee_id);
+"""
+
+SELECT_EMPLOYEES = "SELECT id, name, role FROM employees ORDER BY id"
+SELECT_EMPLOYEE = "SELECT id, name, role FROM employees WHERE id = ?"
+INSERT_EMPLOYEE = "INSERT OR REPLACE INTO employees (id, name, role) VALUES (?, ?, ?)"
+UPDATE_EMPLOYEE = "UPDATE employees SET name = ?, role = ? WHERE id = ?"
+DELETE_EMPLOYEE = "DELETE FROM employees WHERE id = ?"
+SELECT_POLICIES = (
+    "SELECT employee_id, kind, weekly_salary, hourly_rate, commission_per_sale,"
+    " hours_worked FROM policies ORDER BY employee_id"
+)
+SELECT_POLICY = (
+    "SELECT employee_id, kind, weekly_salary, hourly_rate, commission_per_sale,"
+    " hours_worked FROM policies WHERE employee_id = ?"
+)
+UPDATE_HOURS = "UPDATE policies SET hours_worked = ? WHERE employee_id = ?"
+INSERT_POLICY = (
+    "INSERT OR REPLACE INTO policies (employee_id, kind, weekly_salary,"
+    " hourly_rate, commission_per_sale, hours_worked) VALUES (?, ?, ?, ?, ?, ?)"
+)
+SELECT_ADDRESSES = (
+    "SELECT employee_id, street, street2, city, state, zipcode"
+    " FROM addresses ORDER BY employee_id"
+)
+SELECT_ADDRESS = (
+    "SELECT employee_id, street, street2, city, state, zipcode"
+    " FROM addresses WHERE employee_id = ?"
+)
+SELECT_BY_STATE = "SELECT employee_id FROM addresses WHERE state = ?"
+SELECT_BY_CITY = "SELECT employee_id FROM addresses WHERE city = ?"
+SELECT_BY_ZIPCODE = "SELECT employee_id FROM addresses WHERE zipcode = ?"
+SELECT_ZIPCODES = (
+    "SELECT zipcode, employee_id FROM addresses"
+    " WHERE zipcode >= ? AND zipcode < ? ORDER BY zipcode, employee_id"
+)
+DELETE_ADDRESS = "DELETE FROM addresses WHERE employee_id = ?"
+INSERT_ADDRESS = (
+    "INSERT OR REPLACE INTO addresses (employee_id, street, street2, city,"
+    " state, zipcode) VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+# Sorts after any character used in a zipcode, SQLite compares TEXT as UTF-8.
+_MAX_CHAR = "\U0010ffff"
+
+_POLICY_KINDS = {
+    SalaryPolicy: "salary",
+    HourlyPolicy: "hourly",
+    CommissionPolicy: "commission",
+}
+
+
+class SQLiteStorage:
+    def __init__(self, path=":memory:", batch_size=10_000):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        self.batch_size = batch_size
+        self._policies = None
+        self._addresses = None
+
+    def close(self):
+        if self._policies is not None:
+            self._policies.flush()
+        self.connection.close()
+
+    def _stream(self, query, params=()):
+        cursor = self.connection.execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(self.batch_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
+
+    # Employees
+    def employees(self):
+        return StoredEmployees(self)
+
+    def save_employees(self, rows):
+        with self.connection:
+            self.connection.executemany(
+                INSERT_EMPLOYEE,
+                ((row["id"], row["name"], row["role"]) for row in rows),
+            )
+
+    # Payroll policies
+    def policies(self):
+        """
+        The storage's one StoredPolicies, shared by everything built on it.
+        """
+        if self._policies is None:
+            self._policies = StoredPolicies(self)
+        return self._policies
+
+    def iter_policies(self):
+        for row in self._stream(SELECT_POLICIES):
+            yield row[0], _policy(row)
+
+    def save_policies(self, employee_policies):
+        with self.connection:
+            self.connection.executemany(
+                INSERT_POLICY,
+                (
+                    (
+                        employee_id,
+                        _policy_kind(policy),
+                        getattr(policy, "weekly_salary", None),
+                        getattr(policy, "hourly_rate", None),
+                        getattr(policy, "commission_per_sale", None),
+                        policy.hours_worked,
+                    )
+                    for employee_id, policy in employee_policies.items()
+                ),
+            )
+
+    # Addresses
+    def addresses(self):
+        if self._addresses is None:
+            self._addresses = StoredAddressBook(self)
+        return self._addresses
+
+    def iter_addresses(self):
+        for row in self._stream(SELECT_ADDRESSES):
+            yield row[0], _address(row)
+
+    def save_addresses(self, employee_addresses):
+        with self.connection:
+            self.connection.executemany(
+                INSERT_ADDRESS,
+                (
+                    (
+                        employee_id,
+                        address.street,
+                        address.street2,
+                        address.city,
+                        address.state,
+                        address.zipcode,
+                    )
+                    for employee_id, address in employee_addresses.items()
+                ),
+            )
+
+
+def _policy(row):
+    employee_id, kind, salary, rate, commission, hours = row
+    if kind == "salary":
+        policy = SalaryPolicy(salary)
+    elif kind == "hourly":
+        policy = HourlyPolicy(rate)
+    elif kind == "commission":
+        policy = CommissionPolicy(salary, commission)
+    else:
+        raise ValueError(f"Unknown policy kind: {kind}")
+    policy.hours_worked = hours
+    return policy
+
+
+def _address(row):
+    employee_id, street, street2, city, state, zipcode = row
+    return Address(street, city, state, zipcode, street2)
+
+
+def _policy_kind(policy):
+    kind = _POLICY_KINDS.get(type(policy))
+    if kind is None:
+        raise ValueError(f"Unsupported policy type: {type(policy).__name__}")
+    return kind
+
+
+class StoredEmployees:
+    """
+    Employee rows backed by SQLite, with the same interface as EmployeeRows.
+    Iterating streams the table in batches instead of loading it.
+    """
+
+    def __init__(self, storage):
+        self._storage = storage
+
+    def __iter__(self):
+        """
+        Merges the policies and addresses streams in on the way, so the
+        employee's policy and address are ready when it is built.
+        """
+        storage = self._storage
+        policies = storage.policies()
+        addresses = storage.addresses()
+        policy_rows = storage._stream(SELECT_POLICIES)
+        address_rows = storage._stream(SELECT_ADDRESSES)
+        policy_row = next(policy_rows, None)
+        address_row = next(address_rows, None)
+        for id, name, role in storage._stream(SELECT_EMPLOYEES):
+            while policy_row is not None and policy_row[0] < id:
+                policy_row = next(policy_rows, None)
+            while address_row is not None and address_row[0] < id:
+                address_row = next(address_rows, None)
+            # Held while the employee is built, the caches are weak.
+            policy = address = None
+            if policy_row is not None and policy_row[0] == id:
+                policy = policies._load(policy_row)
+            if address_row is not None and address_row[0] == id:
+                address = addresses._load(address_row)
+            yield {"id": id, "name": name, "role": role}
+
+    def get(self, employee_id):
+        row = self._storage.connection.execute(
+            SELECT_EMPLOYEE, (employee_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "name": row[1], "role": row[2]}
+
+    def append(self, row):
+        self._storage.save_employees([row])
+
+    def update(self, employee_id, changes):
+        row = self.get(employee_id)
+        row.update(changes)
+        with self._storage.connection:
+            self._storage.connection.execute(
+                UPDATE_EMPLOYEE, (row["name"], row["role"], employee_id)
+            )
+
+    def remove(self, employee_id):
+        with self._storage.connection:
+            self._storage.connection.execute(DELETE_EMPLOYEE, (employee_id,))
+
+
+class StoredPolicies:
+    """
+    Employee id -> policy mapping backed by SQLite, for PayrollSystem.
+    While a policy is in use (e.g. held by an Employee or an incremental
+    engine), get and items return that same object. Policies with tracked
+    hours are kept until their hours are written back.
+    """
+
+    def __init__(self, storage):
+        self._storage = storage
+        self._live = weakref.WeakValueDictionary()
+        self._changed = {}
+
+    def _load(self, row):
+        policy = self._live.get(row[0])
+        if policy is None:
+            policy = self._live[row[0]] = _policy(row)
+            policy.add_observer(partial(self._tracked, row[0]))
+        return policy
+
+    def _tracked(self, employee_id, policy, hours):
+        self._changed[employee_id] = policy
+        if len(self._changed) >= self._storage.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the hours of the changed policies to the policies table.
+        """
+        if not self._changed:
+            return
+        changed, self._changed = self._changed, {}
+        with self._storage.connection:
+            self._storage.connection.executemany(
+                UPDATE_HOURS,
+                (
+                    (policy.hours_worked, employee_id)
+                    for employee_id, policy in changed.items()
+                ),
+            )
+
+    def get(self, employee_id, default=None):
+        policy = self._live.get(employee_id)
+        if policy is None:
+            row = self._storage.connection.execute(
+                SELECT_POLICY, (employee_id,)
+            ).fetchone()
+            if row is None:
+                return default
+            policy = self._load(row)
+        return policy
+
+    def items(self):
+        for row in self._storage._stream(SELECT_POLICIES):
+            yield row[0], self._load(row)
+
+
+class StoredAddressBook:
+    """
+    AddressBook backed by SQLite. Lookups and the state, city and zipcode
+    queries run against the addresses table and its indexes.
+    """
+
+    def __init__(self, storage):
+        self._storage = storage
+        self._live = weakref.WeakValueDictionary()
+
+    def _load(self, row):
+        address = self._live.get(row[0])
+        if address is None:
+            address = self._live[row[0]] = _address(row)
+        return address
+
+    def get_employee_address(self, employee_id):
+        address = self._live.get(employee_id)
+        if address is None:
+            row = self._storage.connection.execute(
+                SELECT_ADDRESS, (employee_id,)
+            ).fetchone()
+            if row is None:
+                raise ValueError(employee_id)
+            address = self._load(row)
+        return address
+
+    def add_address(self, employee_id, address):
+        self._storage.save_addresses({employee_id: address})
+        self._live[employee_id] = address
+
+    def update_address(self, employee_id, **changes):
+        address = self.get_employee_address(employee_id)
+        for field, value in changes.items():
+            setattr(address, field, value)
+        self._storage.save_addresses({employee_id: address})
+
+    def remove_address(self, employee_id):
+        self.get_employee_address(employee_id)
+        with self._storage.connection:
+            self._storage.connection.execute(DELETE_ADDRESS, (employee_id,))
+        self._live.pop(employee_id, None)
+
+    def _ids(self, query, value):
+        return {row[0] for row in self._storage._stream(query, (value,))}
+
+    def by_state(self, state):
+        return self._ids(SELECT_BY_STATE, state)
+
+    def by_city(self, city):
+        return self._ids(SELECT_BY_CITY, city)
+
+    def by_zipcode(self, zipcode):
+        return self._ids(SELECT_BY_ZIPCODE, zipcode)
+
+    def iter_zipcodes(self, low=None, high=None):
+        """
+        Yields (zipcode, employee ids) in zipcode order for low <= zipcode < high.
+        """
+        rows = self._storage._stream(
+            SELECT_ZIPCODES, ("" if low is None else low, _high(high))
+        )
+        zipcode, ids = None, set()
+        for row_zipcode, employee_id in rows:
+            if row_zipcode != zipcode:
+                if ids:
+                    yield zipcode, ids
+                zipcode, ids = row_zipcode, set()
+            ids.add(employee_id)
+        if ids:
+            yield zipcode, ids
+
+    def by_zipcode_range(self, low, high):
+        return [
+            employee_id
+            for _, ids in self.iter_zipcodes(low, high)
+            for employee_id in sorted(ids)
+        ]
+
+    def by_zipcode_prefix(self, prefix):
+        return self.by_zipcode_range(prefix, prefix + _MAX_CHAR)
+
+
+def _high(high):
+    return _MAX_CHAR if high is None else high
+
+
+if __name__ == "__main__":
+    from employees import EmployeeDatabase
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    roles = ["manager", "secretary", "sales", "factory"]
+    storage = SQLiteStorage()
+    storage.save_employees(
+        {"id": i, "name": f"Employee {i}", "role": roles[i % 4]}
+        for i in range(size)
+    )
+    storage.save_policies({i: HourlyPolicy(10 + i % 20) for i in range(size)})
+    storage.save_addresses(
+        {i: Address(f"{i} Main St", "Concord", "NH", "03301") for i in range(size)}
+    )
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    employee_database = EmployeeDatabase.from_storage(storage)
+    count = sum(1 for _ in employee_database.iter_employees(cache=False))
+    hydrated = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    print(f"Hydrated {count} employees in {hydrated:.2f}s, peak {peak:.1f} MiB")
+
+    # Hours tracked while streaming survive the dropped employees, before and
+    # after they were written back, and reach an incremental engine.
+    storage = SQLiteStorage(batch_size=3)
+    storage.save_employees(
+        {"id": i, "name": f"Employee {i}", "role": "factory"} for i in range(5)
+    )
+    storage.save_policies({i: HourlyPolicy(10) for i in range(5)})
+    storage.save_addresses(
+        {i: Address(f"{i} Main St", "Concord", "NH", "03301") for i in range(5)}
+    )
+    employee_database = EmployeeDatabase.from_storage(storage)
+    for employee in employee_database.iter_employees(cache=False):
+        employee.track_work(40)
+    amounts = [
+        employee.calculate_payroll()
+        for employee in employee_database.iter_employees(cache=False)
+    ]
+    assert amounts == [400] * 5, amounts
+    engine = employee_database.payroll.incremental()
+    engine.run()
+    employee_database.get_employee(4).track_work(8)
+    assert engine.dirty == {4} and engine.run() == 2080
+    storage.close()
+    print("Tracked hours kept while streaming")
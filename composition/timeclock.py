@@ -0,0 +1,141 @@
+"""
+asyncio time-clock ingestion for ProductivitySystem.
+
+Punch events (employee_id, hours) arrive from producers or from a local
+socket (one "employee_id hours" line per event) and go through a bounded
+queue, so producers wait when the consumer falls behind. The consumer drains
+the queue in micro-batches, adds up the hours per employee inside a batch and
+applies them with one track_work call per employee.
+"""
+
+import asyncio
+import sys
+import time
+from collections import defaultdict
+
+_STOP = object()
+
+
+class TimeClock:
+    def __init__(self, employees, maxsize=10_000, batch_size=500):
+        self._employees = {employee.id: employee for employee in employees}
+        self.queue = asyncio.Queue(maxsize)
+        self.batch_size = batch_size
+        self.events = 0
+        self.batches = 0
+        self.rejected = 0
+        self._started = None
+        self._elapsed = 0.0
+        self._closed = False
+
+    async def submit(self, employee_id, hours):
+        if self._closed:
+            raise RuntimeError("time clock is closed")
+        # Waits while the queue is full, which is the backpressure.
+        await self.queue.put((employee_id, hours))
+
+    async def run(self):
+        """
+        Consumes events until close() is called.
+        """
+        self._started = time.perf_counter()
+        try:
+            while True:
+                batch = [await self.queue.get()]
+                while len(batch) < self.batch_size and not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                taken = len(batch)
+                stop = _STOP in batch
+                if stop:
+                    # Producers blocked on a full queue can still land events
+                    # after the sentinel, those are rejected, not applied.
+                    late = batch[batch.index(_STOP) + 1 :]
+                    del batch[len(batch) - len(late) - 1 :]
+                    while not self.queue.empty():
+                        late.append(self.queue.get_nowait())
+                        taken += 1
+                    self.rejected += len(late)
+                self._apply(batch)
+                for _ in range(taken):
+                    self.queue.task_done()
+                if stop:
+                    return
+        finally:
+            self._elapsed = time.perf_counter() - self._started
+
+    def _apply(self, batch):
+        hours_by_employee = defaultdict(int)
+        for employee_id, hours in batch:
+            if employee_id in self._employees:
+                hours_by_employee[employee_id] += hours
+                self.events += 1
+            else:
+                self.rejected += 1
+        for employee_id, hours in hours_by_employee.items():
+            self._employees[employee_id].payroll.track_work(hours)
+        self.batches += 1
+
+    async def close(self):
+        """
+        Stops run() after the events submitted so far, later submits raise
+        RuntimeError.
+        """
+        self._closed = True
+        await self.queue.put(_STOP)
+
+    async def handle_connection(self, reader, writer):
+        while line := await reader.readline():
+            try:
+                employee_id, hours = line.split()
+                await self.submit(int(employee_id), _parse_hours(hours))
+            except (ValueError, RuntimeError):
+                self.rejected += 1
+        writer.close()
+        await writer.wait_closed()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def stats(self):
+        elapsed = self._elapsed
+        if self._started is not None and not elapsed:
+            elapsed = time.perf_counter() - self._started
+        return {
+            "events": self.events,
+            "batches": self.batches,
+            "rejected": self.rejected,
+            "seconds": elapsed,
+            "events_per_second": self.events / elapsed if elapsed else 0.0,
+        }
+
+
+def _parse_hours(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+async def _demo(size):
+    from employees import EmployeeDatabase
+
+    employee_database = EmployeeDatabase()
+    employees = employee_database.employees
+    clock = TimeClock(employees, maxsize=1_000)
+    consumer = asyncio.create_task(clock.run())
+    for i in range(size):
+        await clock.submit(employees[i % len(employees)].id, 1)
+    await clock.close()
+    await consumer
+
+    for employee in employees:
+        print(f"{employee.id} - {employee.name}: {employee.payroll.hours_worked} hours")
+    stats = clock.stats()
+    print(
+        f"{stats['events']} events in {stats['batches']} batches, "
+        f"{stats['events_per_second']:,.0f} events/s"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
@@ -0,0 +1,204 @@
+"""
+Final design with __slots__ records.
+
+Every object of final_design.py carries a __dict__ and is built through
+several __init__ calls across its bases. Here the role and policy mixins
+declare empty __slots__, so they add behaviour but no per-instance state,
+and the data lives in one slotted record class per field layout with a
+single __init__. The employee classes combine a record with a role and a
+policy exactly like before.
+"""
+
+import sys
+import time
+import tracemalloc
+
+print(" =====================  version v4 ================ ")
+
+
+# Productivity module
+class ProductivitySystem:
+    def track(self, employees, hours):
+        print("Tracking Employee Productivity v4")
+        print("==============================")
+        for employee in employees:
+            result = employee.work(hours)
+            print(f"{employee.name}: {result}")
+        print("")
+
+
+class ManagerRole:
+    __slots__ = ()
+
+    def work(self, hours):
+        return f"screams and yells for {hours} hours."
+
+
+class SecretaryRole:
+    __slots__ = ()
+
+    def work(self, hours):
+        return f"expends {hours} hours doing office paperwork."
+
+
+class SalesRole:
+    __slots__ = ()
+
+    def work(self, hours):
+        return f"expends {hours} hours on the phone."
+
+
+class FactoryRole:
+    __slots__ = ()
+
+    def work(self, hours):
+        return f"manufactures gadgets for {hours} hours."
+
+
+# HR module.
+class PayrollSystem:
+    def calculate_payroll(self, employees):
+        print("Calculating Payroll")
+        print("===================")
+        for employee in employees:
+            print(f"Payroll for: {employee.id} - {employee.name}")
+            print(f"- Check amount: {employee.calculate_payroll()}")
+            print("")
+
+
+class SalaryPolicy:
+    __slots__ = ()
+
+    def calculate_payroll(self):
+        return self.weekly_salary
+
+
+class HourlyPolicy:
+    __slots__ = ()
+
+    def calculate_payroll(self):
+        return self.hours_worked * self.hourly_rate
+
+
+class CommissionPolicy(SalaryPolicy):
+    __slots__ = ()
+
+    def calculate_payroll(self):
+        fixed = super().calculate_payroll()
+        return fixed + self.commission
+
+
+# Employee module
+class Employee:
+    __slots__ = ("id", "name")
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+
+# Records hold the fields of one layout and are the only __init__ on the
+# construction path. Only one base of a class may have non-empty slots, which
+# is why roles and policies stay empty.
+
+
+class SalariedRecord(Employee):
+    __slots__ = ("weekly_salary",)
+
+    def __init__(self, id, name, weekly_salary):
+        self.id = id
+        self.name = name
+        self.weekly_salary = weekly_salary
+
+
+class CommissionedRecord(Employee):
+    __slots__ = ("weekly_salary", "commission")
+
+    def __init__(self, id, name, weekly_salary, commission):
+        self.id = id
+        self.name = name
+        self.weekly_salary = weekly_salary
+        self.commission = commission
+
+
+class HourlyRecord(Employee):
+    __slots__ = ("hours_worked", "hourly_rate")
+
+    def __init__(self, id, name, hours_worked, hourly_rate):
+        self.id = id
+        self.name = name
+        self.hours_worked = hours_worked
+        self.hourly_rate = hourly_rate
+
+
+class Manager(SalariedRecord, ManagerRole, SalaryPolicy):
+    __slots__ = ()
+
+
+class Secretary(SalariedRecord, SecretaryRole, SalaryPolicy):
+    __slots__ = ()
+
+
+class SalesPerson(CommissionedRecord, SalesRole, CommissionPolicy):
+    __slots__ = ()
+
+
+class FactoryWorker(HourlyRecord, FactoryRole, HourlyPolicy):
+    __slots__ = ()
+
+
+class TemporarySecretary(HourlyRecord, SecretaryRole, HourlyPolicy):
+    __slots__ = ()
+
+
+def _roster(module, size):
+    builders = [
+        lambda i: module.Manager(i, "Mary Poppins", 3000),
+        lambda i: module.Secretary(i, "John Smith", 1500),
+        lambda i: module.SalesPerson(i, "Kevin Bacon", 1000, 250),
+        lambda i: module.FactoryWorker(i, "Jane Doe", 40, 15),
+        lambda i: module.TemporarySecretary(i, "Robin Williams", 40, 9),
+    ]
+    return [builders[i % 5](i) for i in range(size)]
+
+
+def _measure(module, size):
+    start = time.perf_counter()
+    _roster(module, size)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    roster = _roster(module, size)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # The roster list itself is the same for both designs.
+    used -= sys.getsizeof(roster)
+    return size / elapsed, used / size
+
+
+if __name__ == "__main__":
+    manager = Manager(1, "Mary Poppins", 3000)
+    secretary = Secretary(2, "John Smith", 1500)
+    sales_guy = SalesPerson(3, "Kevin Bacon", 1000, 250)
+    factory_worker = FactoryWorker(4, "Jane Doe", 40, 15)
+    temporary_secretary = TemporarySecretary(5, "Robin Williams", 40, 9)
+    employees = [manager, secretary, sales_guy, factory_worker, temporary_secretary]
+
+    productivity_system = ProductivitySystem()
+    productivity_system.track(employees, 40)
+
+    payroll_system = PayrollSystem()
+    payroll_system.calculate_payroll(employees)
+
+    # Imported for the comparison only, it prints its own version banner.
+    import final_design
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"\n{size} employees")
+    print(f"{'design':<14}{'objects/s':>14}{'bytes/object':>14}")
+    for name, module in (
+        ("final_design", final_design),
+        ("slots", sys.modules[__name__]),
+    ):
+        rate, per_object = _measure(module, size)
+        print(f"{name:<14}{rate:>14,.0f}{per_object:>14.1f}")